@@ -0,0 +1,132 @@
+"""
+File: batch.py
+Description:
+    Command line batch runner for grading problem sets in bulk.
+    Reads expressions from a JSONL or CSV file and streams
+    calculate_many results out as JSON lines.
+
+    JSONL: one object per line, {"expr": "d/dx[x^2]", "conditions": ["x", "", "", "", "", ""]}
+           (a bare json string is also accepted)
+    CSV:   header row with an 'expr' column and optional condition
+           columns 'wrt', 'lim', 'lower', 'upper', 'i', 'n', 'timeout'
+
+Usage:
+    python batch.py problems.jsonl [-o results.jsonl] [--chunk-size 256] [-j WORKERS]
+                                   [--profile DIR] [--profile-every N]
+"""
+
+import argparse
+import csv
+import json
+import sys
+from itertools import islice
+
+import calculator
+import profiling
+from calculator import calculate_many
+
+
+condition_columns = ['wrt', 'lim', 'lower', 'upper', 'i', 'n', 'timeout']
+
+def read_jsonl(f):
+    """
+    Reads (expr, conditions) pairs from JSONL lines
+
+    :param f: open text file
+    :returns: generator of (expr, conditions)
+    """
+
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        row = json.loads(line)
+        if isinstance(row, str):
+            yield row, [''] * 6
+        else:
+            conditions = list(row.get('conditions') or [])
+            yield row['expr'], conditions + [''] * (6 - len(conditions))
+
+def read_csv(f):
+    """
+    Reads (expr, conditions) pairs from CSV rows
+
+    :param f: open text file
+    :returns: generator of (expr, conditions)
+    """
+
+    for row in csv.DictReader(f):
+        yield row['expr'], [row.get(col) or '' for col in condition_columns]
+
+def read_problems(f, fmt):
+    """
+    :param f: open text file
+    :param fmt: 'jsonl' or 'csv'
+    :returns: generator of (expr, conditions)
+    """
+
+    if fmt == 'csv':
+        return read_csv(f)
+    return read_jsonl(f)
+
+def run(problems, out, chunk_size=256, workers=None):
+    """
+    Calculates problems in chunks, writing one json line per result
+
+    :param problems: iterable of (expr, conditions)
+    :param out: open text file results are written to
+    :param chunk_size: number of problems evaluated together
+    :param workers: worker processes per chunk (None runs in this process)
+    :returns: number of problems calculated
+    """
+
+    problems = iter(problems)
+    count = 0
+    while True:
+        chunk = list(islice(problems, chunk_size))
+        if not chunk:
+            return count
+        exprs = [expr for expr, _ in chunk]
+        conditions = [condi for _, condi in chunk]
+        for expr, result in zip(exprs, calculate_many(exprs, conditions, workers)):
+            if result is not None and not isinstance(result, str):
+                # Timeout results
+                result = str(result)
+            out.write(json.dumps({'expr': expr, 'result': result}, ensure_ascii=False) + '\n')
+        out.flush()
+        count += len(chunk)
+
+def main(argv=None):
+    """Command line entry point"""
+
+    parser = argparse.ArgumentParser(description='Calculate a file of expressions in bulk')
+    parser.add_argument('input', help="JSONL or CSV file of expressions ('-' for stdin)")
+    parser.add_argument('-o', '--output', help='write results here instead of stdout')
+    parser.add_argument('--format', choices=['jsonl', 'csv'],
+                        help='input format (default: from file extension, jsonl for stdin)')
+    parser.add_argument('--chunk-size', type=int, default=256,
+                        help='problems evaluated per calculate_many call')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='spread each chunk over this many worker processes')
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # Profiles calculate in this process (calculations sent to -j workers aren't profiled)
+    profiling.configure(args.profile, args.profile_every)
+    if profiling.enabled():
+        profiling.patch(calculator, 'calculate')
+
+    fmt = args.format or ('csv' if args.input.endswith('.csv') else 'jsonl')
+    f = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8', newline='')
+    out = sys.stdout if args.output is None else open(args.output, 'w', encoding='utf-8')
+    try:
+        run(read_problems(f, fmt), out, args.chunk_size, args.workers)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,446 @@
+"""
+File: benchmark.py
+Description:
+    Standalone timing runner for hot paths of calculator.py, vector.py and
+    graph.py, and for the import time of main.py's startup modules.
+    Run with `python benchmark.py`, set CALC_STARTUP_LOG to a file path
+    to append startup times there (one json line per run).
+
+    The suite (fixed workloads, fixed seeds, caches emptied before every
+    run) writes json to compare between commits:
+        python benchmark.py --json before.json
+        python benchmark.py --json after.json
+        python benchmark.py --compare before.json after.json
+"""
+
+import argparse
+import ast
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import sympy as smp
+
+import calculator
+import expr_store
+import graph
+import numeric
+import vector
+from calculator import clean, post_clean
+from vector import str_to_ndarray
+
+
+def best_time(func, *args, repeat=5, setup=None):
+    """
+    Times a function call, keeping the fastest of several runs
+
+    :param func: function to time
+    :param args: function arguments
+    :param repeat: number of runs
+    :param setup: called (untimed) before each run
+    :returns: fastest run in seconds
+    """
+
+    return min(run_times(func, *args, repeat=repeat, setup=setup))
+
+def run_times(func, *args, repeat=5, setup=None):
+    """
+    :param func: function to time
+    :param args: function arguments
+    :param repeat: number of runs
+    :param setup: called (untimed) before each run
+    :returns: list of run times in seconds
+    """
+
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return times
+
+def clear_caches():
+    """Empties every in-memory cache so each run starts cold"""
+
+    calculator.result_cache.clear()
+    expr_store.store.clear()
+    numeric.compiled_cache.clear()
+    graph.sample_cache.clear()
+    vector.diff_cache.clear()
+    vector.speed_cache.clear()
+
+def bench_clean_scaling(sizes=(1000, 10000, 100000)):
+    """
+    Times clean / post_clean on growing expressions, per character
+    time should stay flat if scaling is linear
+
+    :param sizes: expression lengths in characters
+    :returns: list of (size, clean seconds, post_clean seconds)
+    """
+
+    unit = '6x(x+1)^2+sin(x)e-'
+    results = []
+    for size in sizes:
+        expr = (unit * (size // len(unit) + 1))[:size]
+        cleaned = clean(expr)
+        results.append((size, best_time(clean, expr), best_time(post_clean, cleaned)))
+    return results
+
+def list_parse(vec):
+    """
+    Reference parser: split then convert element by element
+
+    :param vec: vector expression
+    :returns: ndarray
+    """
+
+    vec = vec.replace(' ', '').replace('[', '').replace(']', '')
+    return np.array([float(num) for num in vec.split(',')])
+
+def bench_vector_parsing(size=10 ** 6):
+    """
+    Times bulk vector parsing against per-element conversion
+
+    :param size: number of vector elements
+    :returns: list of (case, str_to_ndarray seconds, list_parse seconds)
+    """
+
+    rng = np.random.default_rng(0)
+    cases = {
+        'int': '[' + ','.join(map(str, rng.integers(-1000, 1000, size).tolist())) + ']',
+        'float': '[' + ','.join(map(repr, rng.standard_normal(size).tolist())) + ']',
+    }
+    return [(name, best_time(str_to_ndarray, text, repeat=3), best_time(list_parse, text, repeat=3))
+            for name, text in cases.items()]
+
+def import_times(statement):
+    """
+    Runs an import statement in a fresh interpreter with `python -X importtime`
+
+    :param statement: python source, ex. 'import calculator'
+    :returns: dict of module -> (self microseconds, cumulative microseconds, nesting depth)
+    """
+
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                          capture_output=True, text=True, check=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times[name.strip()] = (int(own), int(cumulative), depth)
+    return times
+
+def main_imports(path=None):
+    """
+    :param path: main.py path (defaults to the one next to this file)
+    :returns: tuple of modules main.py imports at module level, in order
+    """
+
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        modules += [name for name in names if name not in modules]
+    return tuple(modules)
+
+def bench_startup(startup=None,
+                  eager=('vector', 'graph', 'solver_ai', 'scipy.linalg', 'scipy.integrate',
+                         'matplotlib.figure'), top=8):
+    """
+    Compares the imports main.py does at launch against importing
+    every page's dependencies up front (as main.py used to)
+
+    :param startup: modules imported at launch (defaults to main.py's own imports)
+    :param eager: further modules the other pages load on first use
+    :param top: number of slowest imports at launch to report
+    :returns: dict with total milliseconds per case, the slowest imports at launch
+              and the modules left out because they aren't installed
+    """
+
+    if startup is None:
+        startup = main_imports()
+    # Not installed modules can't be timed, they're reported so the totals aren't mistaken for complete
+    missing = [name for name in startup + eager if importlib.util.find_spec(name.split('.')[0]) is None]
+    startup = tuple(name for name in startup if name not in missing)
+    eager = tuple(name for name in eager if name not in missing)
+
+    results = {'missing': missing}
+    for case, modules in (('startup', startup), ('eager', startup + eager)):
+        times = import_times('import ' + ', '.join(modules))
+        # Outermost imports only, nested ones are inside their parent's cumulative time
+        roots = {name: cum for name, (own, cum, depth) in times.items() if depth == 0}
+        results[case + '_ms'] = sum(roots.values()) / 1000
+        if case == 'startup':
+            slowest = sorted(roots.items(), key=lambda item: item[1], reverse=True)[:top]
+            results['slowest'] = [(name, cum / 1000) for name, cum in slowest]
+    return results
+
+# ---------------- Suite ----------------
+
+# Symbolic calculations through calculator.evaluate, (expr, conditions)
+calc_workloads = {
+    'derivative': ('d/dx[x^3sin(x)e^(2x)]', ['x', '', '', '', '', '']),
+    'partial': ('∂/∂x[x^2*y^3+sin(x*y)]', ['x', '', '', '', '', '']),
+    'integral': ('∫[x^2sin(x)]', ['x', '', '', '', '', '']),
+    'definite integral': ('∫[x*e^(-x)]', ['x', '', '0', 'oo', '', '']),
+    'limit': ('lim[sin(x)/x]', ['x', '0', '', '', '', '']),
+    'series': ('Σ[1/n^2]', ['', '', '', '', '1', 'oo']),
+    'regular': ('(2^10+sqrt(16))/3-sin(π/6)', ['', '', '', '', '', '']),
+}
+
+# Inputs of the symbolic vector operations (small only)
+symbolic_inputs = {
+    'length': ('[cos(t), sin(t), t]', '0, 10'),
+    'deriv': ('[t^3, sin(t)cos(t), e^t]', None),
+    'grad': ('x^2*y+sin(z)*x', None),
+    'div': ('[x*y, y*z^2, z*x]', None),
+    'curl': ('[x*y, y*z^2, z*x]', None),
+    'jacobian': ('[x*y, y*z^2, z*x]', None),
+}
+
+# Operand sizes: vector length / matrix dimension
+vector_sizes = {'small': 3, 'large': 100000}
+matrix_sizes = {'small': 3, 'large': 200}
+
+# Expressions sampled by graph.sample
+graph_workloads = ['sin(x)', 'x^3-2x', 'tan(x)', 'sin(1/x)']
+
+def vec_text(values):
+    """
+    :param values: 1-d array
+    :returns: vector expression
+    """
+
+    return '[' + ', '.join(map(repr, values.tolist())) + ']'
+
+def mat_text(values):
+    """
+    :param values: 2-d array
+    :returns: matrix expression ('[a, b; c, d]')
+    """
+
+    return '[' + '; '.join(', '.join(map(repr, row)) for row in values.tolist()) + ']'
+
+def vector_inputs(oper, size, rng):
+    """
+    Builds fixed operands for a vector_calc operation
+
+    :param oper: operation name
+    :param size: 'small' or 'large'
+    :param rng: numpy random generator
+    :returns: (a, b), or None if the operation has no input of that size
+    """
+
+    if oper in symbolic_inputs:
+        return symbolic_inputs[oper] if size == 'small' else None
+    if oper == 'cross':
+        return (vec_text(rng.standard_normal(3).round(6)), vec_text(rng.standard_normal(3).round(6))) \
+            if size == 'small' else None
+
+    n, m = vector_sizes[size], matrix_sizes[size]
+    if oper in ('add', 'sub', 'dot', 'projection'):
+        return vec_text(rng.standard_normal(n).round(6)), vec_text(rng.standard_normal(n).round(6))
+    if oper == 'norm':
+        return vec_text(rng.standard_normal(n).round(6)), None
+    # Well conditioned square matrices
+    a = (rng.standard_normal((m, m)) + m * np.eye(m)).round(6)
+    if oper == 'matmul':
+        return mat_text(a), mat_text(rng.standard_normal((m, m)).round(6))
+    if oper == 'solve':
+        return mat_text(a), vec_text(rng.standard_normal(m).round(6))
+    return mat_text(a), None
+
+def bench_calculate(repeat=5):
+    """
+    :param repeat: runs per workload
+    :returns: dict of workload -> run times in seconds
+    """
+
+    # Failing paths time the error handling, not the work
+    for name, (expr, condi) in calc_workloads.items():
+        clear_caches()
+        if calculator.evaluate(expr, condi) in (None, 'None', 'ERROR'):
+            raise RuntimeError(f'calculate workload {name!r} fails: {expr}')
+    return {name: run_times(calculator.evaluate, expr, condi, repeat=repeat, setup=clear_caches)
+            for name, (expr, condi) in calc_workloads.items()}
+
+def bench_vector_ops(repeat=5, seed=0):
+    """
+    Times every registered vector_calc operation on small and large operands
+
+    :param repeat: runs per operation / size
+    :param seed: random seed for operands
+    :returns: dict of 'operation/size' -> run times in seconds
+    """
+
+    rng = np.random.default_rng(seed)
+    results = {}
+    for op in vector.operations:
+        for size in ('small', 'large'):
+            operands = vector_inputs(op.name, size, rng)
+            if operands is not None:
+                results[f'{op.name}/{size}'] = run_times(vector.vector_calc, op.name, *operands,
+                                                         repeat=repeat, setup=clear_caches)
+    return results
+
+def bench_arc_length(repeat=5):
+    """
+    :param repeat: runs per case
+    :returns: dict of case -> run times in seconds
+    """
+
+    curve, bounds = symbolic_inputs['length']
+    intervals = [(k, k + 1) for k in range(100)]
+    return {
+        'quad': run_times(vector.arc_length, curve, bounds, 'quad', repeat=repeat, setup=clear_caches),
+        'gauss': run_times(vector.arc_length, curve, bounds, 'gauss', repeat=repeat, setup=clear_caches),
+        'batched x100': run_times(vector.arc_lengths, [curve], intervals, repeat=repeat, setup=clear_caches),
+    }
+
+def bench_graph(repeat=5):
+    """
+    :param repeat: runs per expression
+    :returns: dict of expression -> run times in seconds
+    """
+
+    return {expr: run_times(graph.sample, expr, repeat=repeat, setup=clear_caches)
+            for expr in graph_workloads}
+
+def bench_clean(repeat=5, size=100000):
+    """
+    :param repeat: runs per function
+    :param size: expression length in characters
+    :returns: dict of function -> run times in seconds
+    """
+
+    unit = '6x(x+1)^2+sin(x)e-'
+    expr = (unit * (size // len(unit) + 1))[:size]
+    cleaned = clean(expr)
+    return {'clean': run_times(clean, expr, repeat=repeat),
+            'post_clean': run_times(post_clean, cleaned, repeat=repeat)}
+
+def git_commit():
+    """
+    :returns: current commit hash, or None outside a git checkout
+    """
+
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(repeat=5):
+    """
+    Runs every suite benchmark
+
+    :param repeat: runs per benchmark
+    :returns: json serializable dict, {'meta': {...}, 'results': {name: {'min', 'median', 'runs'}}}
+    """
+
+    groups = {
+        'clean': bench_clean(repeat),
+        'calculate': bench_calculate(repeat),
+        'vector': bench_vector_ops(repeat),
+        'arc_length': bench_arc_length(repeat),
+        'graph': bench_graph(repeat),
+    }
+    results = {}
+    for group, benches in groups.items():
+        for name, times in benches.items():
+            results[f'{group}/{name}'] = {'min': min(times), 'median': statistics.median(times),
+                                          'runs': len(times)}
+    meta = {
+        'time': time.time(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sympy': smp.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+    return {'meta': meta, 'results': results}
+
+def compare(old, new, threshold=1.1):
+    """
+    Compares two suite results on their fastest runs
+
+    :param old: earlier run_suite result
+    :param new: later run_suite result
+    :param threshold: new / old time ratio counted as a regression
+    :returns: list of (name, old seconds, new seconds, ratio, regressed), slowest ratio first
+    """
+
+    rows = []
+    for name, result in new['results'].items():
+        if name in old['results']:
+            before, after = old['results'][name]['min'], result['min']
+            ratio = after / before if before else float('inf')
+            rows.append((name, before, after, ratio, ratio > threshold))
+    return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time calculator hot paths')
+    parser.add_argument('--json', metavar='PATH', help="run the suite, writing results here ('-' for stdout)")
+    parser.add_argument('--repeat', type=int, default=5, help='runs per suite benchmark')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two suite results')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='slowdown ratio reported as a regression by --compare')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            rows = compare(json.load(f_old), json.load(f_new), args.threshold)
+        print(f'{"benchmark":<32} {"old (s)":>10} {"new (s)":>10} {"ratio":>7}')
+        for name, before, after, ratio, regressed in rows:
+            print(f'{name:<32} {before:>10.5f} {after:>10.5f} {ratio:>7.2f}' + ('  REGRESSION' if regressed else ''))
+        sys.exit(1 if any(row[4] for row in rows) else 0)
+
+    if args.json:
+        suite = run_suite(args.repeat)
+        text = json.dumps(suite, indent=2)
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json, 'w') as f:
+                f.write(text + '\n')
+        sys.exit(0)
+
+    print(f'{"chars":>8} {"clean (s)":>12} {"ns/char":>8} {"post_clean (s)":>15} {"ns/char":>8}')
+    for size, t_clean, t_post in bench_clean_scaling():
+        print(f'{size:>8} {t_clean:>12.5f} {t_clean / size * 1e9:>8.1f} '
+              f'{t_post:>15.5f} {t_post / size * 1e9:>8.1f}')
+
+    print(f'\n{"vector (1e6)":>12} {"str_to_ndarray (s)":>19} {"list parse (s)":>15}')
+    for name, t_bulk, t_list in bench_vector_parsing():
+        print(f'{name:>12} {t_bulk:>19.4f} {t_list:>15.4f}')
+
+    startup = bench_startup()
+    print(f'\nimports at launch: {startup["startup_ms"]:.1f} ms (every page eagerly: {startup["eager_ms"]:.1f} ms)')
+    for name, ms in startup['slowest']:
+        print(f'{name:>20} {ms:>8.1f} ms')
+    if startup['missing']:
+        # Incomplete totals aren't logged, they'd look like a startup improvement
+        print(f'not installed, left out: {", ".join(startup["missing"])}')
+    elif os.getenv('CALC_STARTUP_LOG'):
+        with open(os.getenv('CALC_STARTUP_LOG'), 'a') as f:
+            f.write(json.dumps({'time': time.time(), **startup}) + '\n')
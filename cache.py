@@ -0,0 +1,152 @@
+"""
+File: cache.py
+Description:
+    Implements a bounded, thread-safe LRU cache for calculation results
+    so repeated expressions on the calculator page skip re-evaluation.
+    Can optionally persist warm results to a json file between runs.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class ExpressionCache:
+    """
+    Least recently used cache keyed on a normalized expression
+    plus the conditions list it was calculated with
+    """
+
+    def __init__(self, maxsize=512, path=None):
+        """
+        :param maxsize: max number of stored results (oldest evicted first)
+        :param path: optional json file used to persist results
+        """
+
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        if path is not None:
+            self.load()
+
+    @staticmethod
+    def make_key(expr, conditions):
+        """
+        Builds a hashable cache key
+
+        :param expr: expression
+        :param conditions: list of function conditionals
+        :returns: key tuple
+        """
+
+        expr = expr.replace(' ', '')
+        conditions = tuple(str(c).replace(' ', '') for c in (conditions or ()))
+        return (expr,) + conditions
+
+    def get(self, key, default=None):
+        """
+        Looks up a cached result, marking it as recently used
+
+        :param key: key from make_key
+        :param default: returned on a miss
+        :returns: cached result or default
+        """
+
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        Stores a result, evicting the least recently used entries if full
+
+        :param key: key from make_key
+        :param value: calculated result
+        """
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def clear(self):
+        """Empties cache and resets counters"""
+
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        :returns: dict of hits, misses, size and maxsize
+        """
+
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._data), 'maxsize': self.maxsize}
+
+    def save(self, path=None):
+        """
+        Writes cached results to a json file
+
+        :param path: file path (defaults to the cache's path)
+        """
+
+        path = path or self.path
+        if path is None:
+            return
+        with self._lock:
+            entries = [[list(k), v] for k, v in self._data.items()]
+
+        # Write then rename so a crash never leaves a half written file
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(temp_path, path)
+
+    def load(self, path=None):
+        """
+        Reads cached results from a json file, if it exists
+
+        :param path: file path (defaults to the cache's path)
+        """
+
+        path = path or self.path
+        if path is None or not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            # Corrupt / unreadable file, start cold
+            return
+        for key, value in entries:
+            self.put(tuple(key), value)
+
+
+# Test:
+if __name__ == '__main__':
+    cache = ExpressionCache(maxsize=2)
+    cache.put(cache.make_key('x^2', ['x']), '2x')
+    cache.put(cache.make_key('x^3', ['x']), '3x^2')
+    cache.put(cache.make_key('x^4', ['x']), '4x^3')
+    print(cache.get(cache.make_key('x ^2', ['x'])), cache.stats())
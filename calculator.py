@@ -5,7 +5,18 @@ Description:
     to be used on the calculator page for symbolic and calculus calculations in main.py.
 """
 
+import ast
+import atexit
+import operator
+import os
+import re
 import sympy as smp
+import metrics
+from cache import ExpressionCache
+from expr_store import parse
+from registry import Registry
+from tokenizer import to_sympy, from_sympy
+from timeouts import CalcTimeout, budget_for, run_with_timeout
 
 
 # Symbolic assignments (much easier for operational tasks)
@@ -14,6 +25,12 @@ poss_vars = ['x', 'y', 'z']
 operators = ['+', '-', '*', '/', '^']
 special = ['π', 'e', 'sin', 'cos', 'tan', 'sec', 'csc', 'cot', 'ln', 'log']
 
+# Results of previous calculations (set CALC_CACHE_FILE to persist between runs)
+result_cache = ExpressionCache(maxsize=int(os.getenv('CALC_CACHE_SIZE', 512)),
+                               path=os.getenv('CALC_CACHE_FILE'))
+if result_cache.path is not None:
+    atexit.register(result_cache.save)
+
 # ---------------- Functions ----------------
 
 def derivative(expr, wrt):
@@ -55,24 +72,36 @@ def limit(expr, var, toward, side=None):
     Calculates limit of an expression
     :param expr: expression
     :param var: variable approaching
-    :param towar: approaching
-    :side: from left / right / None
+    :param toward: value approached, a trailing + / - approaches from that side (ex. '0+')
+    :param side: '+' / '-' (None = from the suffix of toward, or both sides)
     :returns: evaluated limit
     """
-    if side == None:
-        return smp.limit(expr, var, toward) + ' C' 
-    else:
-        return smp.limit(expr, var, toward, side) + ' C'
-    
-def series(expr, i, n):
+    toward = toward.strip()
+    if not toward:
+        raise ValueError('limit needs a value to approach')
+    if side is None:
+        side = '+-'
+        if len(toward) > 1 and toward[-1] in '+-':
+            toward, side = toward[:-1], toward[-1]
+    return smp.limit(expr, var, parse(clean(toward)), side)
+
+def series(expr, wrt, start, end):
     """
     Calculates series of an expression
     :param expr: expression
-    :param i: i variable
-    :param n: n variable
+    :param wrt: summation variable, if in the expression (else its only variable)
+    :param start: first value, i (defaults to 1)
+    :param end: last value, n (defaults to oo)
     :returns: evaluated series
     """
-    return smp.Sum(expr, i, n)
+    var = wrt
+    if wrt not in expr.free_symbols:
+        if len(expr.free_symbols) != 1:
+            raise ValueError('series needs a summation variable')
+        var = next(iter(expr.free_symbols))
+    start = parse(clean(start.strip() or '1'))
+    end = parse(clean(end.strip() or 'oo'))
+    return smp.summation(expr, (var, start, end))
 
 def natural_log(expr):
     """
@@ -90,6 +119,35 @@ def get_log(expr):
     """
     return smp.log(expr)
 
+# Number-only input, ex. '10/4', '3.5*2', '(2+3)**2'
+number_only = re.compile(r'[\d.+\-*/()]+')
+arithmetic_ops = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+                  ast.Div: operator.truediv, ast.Pow: operator.pow,
+                  ast.USub: operator.neg, ast.UAdd: operator.pos}
+
+def arithmetic(node):
+    """
+    Evaluates a number-only expression tree with Python's own
+    arithmetic (10/4 -> 2.5, 3.5*2 -> 7.0, 2+3 -> 5)
+
+    :param node: ast node
+    :returns: int or float
+    """
+
+    if isinstance(node, ast.Expression):
+        return arithmetic(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in arithmetic_ops:
+        return arithmetic_ops[type(node.op)](arithmetic(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in arithmetic_ops:
+        left, right = arithmetic(node.left), arithmetic(node.right)
+        if isinstance(node.op, ast.Pow) and abs(right) > 1024:
+            # Left to sympy (and its time budget), huge integer powers are slow
+            raise ValueError('exponent too large')
+        return arithmetic_ops[type(node.op)](left, right)
+    raise ValueError('not arithmetic')
+
 def regular(expr):
     """
     Evaluates non formulatic symbolic and 
@@ -99,19 +157,33 @@ def regular(expr):
     :returns: evaluated expression
     """
 
-    expr = expr.replace('sqrt', 'smp.sqrt')
-    expr = expr.replace('e', 'smp.E')
-    expr = expr.replace('π', 'smp.pi')
-    expr = expr.replace('ln', 'smp.ln')
-    expr = expr.replace('log', 'smp.log')
-    expr = expr.replace('sin', 'smp.sin')
-    expr = expr.replace('cos', 'smp.cos')
-    expr = expr.replace('tan', 'smp.tan')
-    expr = expr.replace('csc', 'smp.csc')
-    expr = expr.replace('cot', 'smp.cot')
-    expr = expr.replace('sec', 'smp.sec')
-    result = eval(expr)
-    return result
+    # Plain numbers keep Python's arithmetic results, as before sympy parsing
+    if isinstance(expr, str) and number_only.fullmatch(expr):
+        try:
+            return arithmetic(ast.parse(expr, mode='eval'))
+        except (SyntaxError, ValueError, ArithmeticError):
+            pass
+
+    # Parsed through the shared store, sympy evaluates on construction
+    return parse(expr)
+
+# ---------------- Operations ----------------
+
+# Operation name (as typed, ex. '∫[x^2]') -> handler(expr, wrt, conditions),
+# expressions are parsed once, by the operation's parser (regular parses its own)
+operations = Registry()
+operations.register('d/dx', lambda expr, wrt, c: derivative(expr, wrt), label='derivative',
+                    optional=2, parser=parse, cost='symbolic', budget='derivative')
+operations.register('∫', lambda expr, wrt, c: integral(expr, wrt, c[2], c[3]), label='integral',
+                    optional=2, parser=parse, cost='symbolic', budget='integral')
+operations.register('lim', lambda expr, wrt, c: limit(expr, wrt, c[1]), label='limit',
+                    optional=2, parser=parse, cost='symbolic', budget='limit')
+operations.register('∂/∂x', lambda expr, wrt, c: partial_deriv(expr, wrt), label='partial derivative',
+                    optional=2, parser=parse, cost='symbolic', budget='derivative')
+operations.register('Σ', lambda expr, wrt, c: series(expr, wrt, c[4], c[5]), label='series',
+                    optional=2, parser=parse, cost='symbolic', budget='series')
+operations.register('regular', lambda expr, wrt, c: regular(expr),
+                    optional=2, cost='symbolic', budget='regular')
 
 # ---------------- Clean up / Inside-eval ----------------
 
@@ -124,43 +196,32 @@ def clean(expr):
     :returns: cleaned expression for evaluation
     """
 
-    # Length edge-case
-    if len(expr) < 1:
-        return expr
-    else:
-        # Initialize to first char (loop starts from i=1, checking i-1)
-        cleaned_expr = expr[0]
-
-    try:
-        # Lack of * sign
-        for i in range(1, len(expr)):  # edge cases: 6x -> 6*x, x^2 -> x**2
-            if (expr[i-1].isnumeric() and expr[i] in poss_vars) or (expr[i] == '(' or expr[i-1] == ')') \
-                and (expr[i-1] not in operators and expr[i] not in operators):
-                if (expr[i-1] in '()' and expr[i] in '()') or \
-                    ((not expr[i-1].isnumeric() and expr[i-1] not in operators and expr[i-1] not in poss_vars) and expr[i] == '('):
-                    # In case of parens
-                    cleaned_expr += expr[i]
-                else:
-                    # Sandwich a '*'
-                    cleaned_expr += '*' + expr[i]
-            elif expr[i] == '^':
-                # '^' -> '**'
-                cleaned_expr += '**'
-            else:
-                cleaned_expr += expr[i]
-        return cleaned_expr
-    except:
-        return None
+    # Single pass: 6x -> 6*x, x^2 -> x**2, names -> sympy names
+    return to_sympy(expr, poss_vars)
     
+def apply_operation(operation, expr, wrt, c):
+    """
+    Applies an operation to a cleaned expression
+
+    :param operation: string representation of operation
+    :param expr: cleaned expression
+    :param wrt: with respect to
+    :param c: list of functions conditionals
+    :returns: expression evaluation
+    """
+
+    return operations.call(operation, expr, wrt, c)
+
 def inside_expr(operation, expr, c):
     """
     Evaluate inside expressions after expr cleaned with
-    function conditions / specifications
+    function conditions / specifications, within the
+    operation type's time budget (see timeouts.py)
 
     :param operation: string representation of operation
     :param expr: expression
-    :param c: list of functions conditionals
-    :returns: expression evaluation
+    :param c: list of functions conditionals (optional 7th: budget in seconds)
+    :returns: expression evaluation, or CalcTimeout if budget exceeded
     """
 
     wrt = x
@@ -170,18 +231,12 @@ def inside_expr(operation, expr, c):
         wrt = z
 
     try:
-        if operation == 'd/dx':
-            return derivative(expr, wrt)
-        if operation == '∫':
-            return integral(expr, wrt, c[2], c[3])
-        if operation == 'lim':
-            return limit(expr, wrt, c[1])
-        if operation == '∂/∂x':
-            return partial_deriv(expr, wrt)
-        if operation == 'Σ':
-            return series(expr, c[4], c[5])
-        if operation == 'regular':
-            return regular(expr)
+        op = operations.get(operation)
+        seconds = budget_for(op.budget, c)
+        if seconds is not None:
+            # Killable child process
+            return run_with_timeout(op.budget, seconds, apply_operation, operation, expr, wrt, c)
+        return apply_operation(operation, expr, wrt, c)
     except:
         return None
     
@@ -197,39 +252,63 @@ def post_clean(expr):
     # ** -> ^  |  * to ''
     if expr == None:
         return None
-    
-    expr = expr.replace('pi', 'π')
-    expr = expr.replace('E', 'e')
-
-    new_expr = ''
-    for i in range(len(expr)):
-        if expr[i] == '*' and expr[i + 1] == '*':
-            new_expr += '^'
-        elif expr[i] == '*':
-            new_expr += ''
-        else:
-            new_expr += expr[i]
-    return new_expr
+    return from_sympy(expr)
 
 # ---------------- Main Calculation ----------------
 
 def calculate(expr, conditions):
     """
-    Calculates symbolic expressions
+    Calculates symbolic expressions, reusing cached
+    results for previously seen expression / conditions
+
+    :param expr: expression
+    :param conditions: conditions (optional 7th: time budget in seconds)
+    :returns: finalized expression, or CalcTimeout if budget exceeded
+    """
+
+    trace = metrics.start('calculate')  # Does nothing unless CALC_METRICS is set
+    with trace.stage('cache'):
+        key = result_cache.make_key(expr, conditions)
+        result = result_cache.get(key, key)
+    if result is not key:
+        trace.operation = operation_name(expr)
+        trace.outcome = 'hit'
+        trace.finish(len(expr), metrics.size_of(result))
+        return result
+    trace.outcome = 'miss'
+    result = evaluate(expr, conditions, trace)
+    if not isinstance(result, CalcTimeout):
+        # Timeouts aren't cached, may pass when less loaded
+        result_cache.put(key, result)
+    trace.finish(len(expr), metrics.size_of(result))
+    return result
+
+def operation_name(expr):
+    """
+    :param expr: expression
+    :returns: name of the operation evaluate applies to it ('regular' for basic calculations)
+    """
+
+    first = expr.replace(' ', '').replace('[', ']').split(']')[0]
+    return first if first in operations else 'regular'
+
+def evaluate(expr, conditions, trace=metrics.null_trace):
+    """
+    Calculates symbolic expressions (uncached)
 
     :param expr: expression
     :param conditions: conditions
+    :param trace: metrics trace timing each stage
     :returns: finalized expression
     """
 
     expr = expr.replace(' ', '')
     table = expr.maketrans('[', ']')
     expr = expr.translate(table).split(']')
-    poss_oper = ['d/dx', '∫', 'lim', '∂/∂x', 'Σ']
     for start in range(len(expr)):
     
-        # 0: derivative, 1: integral, 2: limit, 3: partial_deriv, 4: series
-        if expr[start] in poss_oper:
+        # Registered operation name before the brackets, ex. ∫[...]
+        if expr[start] in operations and expr[start] != 'regular':
             new_expr = ''
             operation = expr[start]
             for calc in range(start+1, len(expr)):
@@ -237,28 +316,83 @@ def calculate(expr, conditions):
                     break
                 else:
                     new_expr += expr[calc]
-            new_expr = clean(new_expr)
+            trace.operation = operation
+            with trace.stage('clean'):
+                new_expr = clean(new_expr)
 
             # If clean doesn't pass, syntax error
             if new_expr == None: 
                 return 'ERROR'
             
-            new_expr = inside_expr(operation, new_expr, conditions)
-            new_expr = str(new_expr)
-            new_expr = post_clean(new_expr)
+            with trace.stage('evaluate'):
+                new_expr = inside_expr(operation, new_expr, conditions)
+            if isinstance(new_expr, CalcTimeout):
+                return new_expr
+            with trace.stage('str'):
+                new_expr = str(new_expr)
+            with trace.stage('post_clean'):
+                new_expr = post_clean(new_expr)
             return new_expr
         else:
             # Basic calculations
-            new_expr = str(expr[start])
-            new_expr = clean(new_expr)
-            new_expr = inside_expr('regular', new_expr, conditions)
-            new_expr = str(new_expr)
-            new_expr = post_clean(new_expr)
+            trace.operation = 'regular'
+            with trace.stage('clean'):
+                new_expr = clean(str(expr[start]))
+            with trace.stage('evaluate'):
+                new_expr = inside_expr('regular', new_expr, conditions)
+            if isinstance(new_expr, CalcTimeout):
+                return new_expr
+            with trace.stage('str'):
+                new_expr = str(new_expr)
+            with trace.stage('post_clean'):
+                new_expr = post_clean(new_expr)
             return new_expr
     return None
 
+def calculate_many(exprs, conditions=None, workers=None):
+    """
+    Calculates many symbolic expressions, evaluating each
+    distinct expression / conditions pair only once
+
+    :param exprs: iterable of expressions
+    :param conditions: one conditions list shared by all expressions,
+                       or a list of conditions lists (one per expression)
+    :param workers: if set, uncached expressions are spread over
+                    this many worker processes (see executor.py)
+    :returns: list of finalized expressions, in input order
+    """
+
+    exprs = list(exprs)
+    if conditions is None:
+        conditions = ['', '', '', '', '', '']
+    if conditions and isinstance(conditions[0], (list, tuple)):
+        per_expr = list(conditions)
+        if len(per_expr) != len(exprs):
+            raise ValueError('expected one conditions list per expression')
+    else:
+        per_expr = [conditions] * len(exprs)
+
+    # Dedupe on normalized key, evaluate unique pairs in first-seen order
+    keys = [result_cache.make_key(e, c) for e, c in zip(exprs, per_expr)]
+    results = {}
+    for key, expr, condi in zip(keys, exprs, per_expr):
+        if key not in results:
+            results[key] = (expr, condi)
+
+    timed_out = {}
+    if workers:
+        from executor import map_calculate
+
+        # Only ship cache misses to the pool, then warm this process' cache
+        missing = [key for key in results if key not in result_cache]
+        computed = map_calculate([results[key][0] for key in missing],
+                                 [results[key][1] for key in missing], workers)
+        for key, result in zip(missing, computed):
+            if isinstance(result, CalcTimeout):
+                timed_out[key] = result
+            else:
+                result_cache.put(key, result)
 
-# Test:
-if __name__ == '__main__':
-    expression = 'arcsin(x)'
-    print(calculate(expression, ['', '', '', '', '', '']))
\ No newline at end of file
+    for key, (expr, condi) in results.items():
+        results[key] = timed_out[key] if key in timed_out else calculate(expr, condi)
+    return [results[key] for key in keys]
@@ -0,0 +1,136 @@
+"""
+File: executor.py
+Description:
+    Implements a process pool evaluation mode so CPU-bound sympy work
+    (integrals, limits, simplification) from calculator.py and vector.py
+    runs across all cores instead of blocking a single thread.
+"""
+
+import atexit
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import calculator
+import vector
+
+
+# Worker count (set CALC_WORKERS, defaults to every core)
+workers = int(os.getenv('CALC_WORKERS', 0)) or os.cpu_count() or 1
+
+_pool = None
+_pool_workers = 0  # Worker count of _pool
+_pool_lock = threading.Lock()
+
+def get_pool(max_workers=None):
+    """
+    Gets the shared process pool, creating it on first use
+
+    :param max_workers: worker count, a different count replaces the running pool
+                        (None keeps the running pool, or starts CALC_WORKERS / core count)
+    :returns: ProcessPoolExecutor
+    """
+
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and max_workers and max_workers != _pool_workers:
+            _pool.shutdown(wait=True)
+            _pool = None
+        if _pool is None:
+            _pool_workers = max_workers or workers
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers)
+        return _pool
+
+def pool_size():
+    """
+    :returns: worker count of the running pool (0 if not started)
+    """
+
+    with _pool_lock:
+        return _pool_workers if _pool is not None else 0
+
+def shutdown(wait=True):
+    """
+    Stops the shared process pool
+
+    :param wait: wait for running jobs to finish
+    """
+
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=not wait)
+            _pool = None
+
+atexit.register(shutdown, False)
+
+def replace_pool():
+    """
+    Replaces the shared process pool with a fresh one of the same size,
+    killing the old workers (the only way to stop a calculation stuck in
+    one). Jobs still on the old pool fail with BrokenProcessPool
+    """
+
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            return
+        old = _pool
+        processes = list((old._processes or {}).values())  # No public way to kill workers before 3.14
+        old.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.kill()
+        _pool = ProcessPoolExecutor(max_workers=_pool_workers)
+
+def submit_calculate(expr, conditions):
+    """
+    Calculates an expression in a worker process
+
+    :param expr: expression
+    :param conditions: list of function conditionals
+    :returns: future of finalized expression
+    """
+
+    return get_pool().submit(calculator.calculate, expr, conditions)
+
+def submit_vector_calc(oper, a, b=None):
+    """
+    Calculates a vector / matrix operation in a worker process,
+    cheap operations (see registry.py) run right away in this process
+    since shipping them costs more than the work
+
+    :param oper: operation
+    :param a: vector a or matrix expression
+    :param b: vector b
+    :returns: future of calculation
+    """
+
+    if vector.operations.cost(oper) != 'cheap':
+        return get_pool().submit(vector.vector_calc, oper, a, b)
+
+    future = Future()
+    try:
+        future.set_result(vector.vector_calc(oper, a, b))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def map_calculate(exprs, conditions, max_workers=None):
+    """
+    Calculates expressions across the process pool
+
+    :param exprs: list of expressions
+    :param conditions: list of conditions lists (one per expression)
+    :param max_workers: worker count
+    :returns: list of finalized expressions, in input order
+    """
+
+    pool = get_pool(max_workers)
+    futures = [pool.submit(calculator.calculate, e, c) for e, c in zip(exprs, conditions)]
+    return [f.result() for f in futures]
+
+
+# Test:
+if __name__ == '__main__':
+    print(map_calculate(['∫[x^2sin(x)]', 'd/dx[x^3]'], [['x', '', '', '', '', '']] * 2))
+    print(submit_vector_calc('cross', '[1,0,0]', '[0,1,0]').result())
@@ -0,0 +1,159 @@
+"""
+File: expr_store.py
+Description:
+    Implements a shared parse layer turning cleaned expression strings into
+    sympy expressions once. Parsed trees are kept in a content-addressed store
+    (in-memory LRU plus an optional SQLite spill file) so calculator.py,
+    vector.py and graph.py reuse one tree for repeated (sub-)expressions.
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+
+import sympy as smp
+from sympy.parsing.sympy_parser import parse_expr
+
+from cache import ExpressionCache
+
+
+# Names user input may contain that sympy doesn't know by default
+local_names = {
+    'smp': smp,
+    'e': smp.E,
+    'π': smp.pi,
+    'ln': smp.ln,
+    'log': smp.log,
+    'sqrt': smp.sqrt,
+    'sec': smp.sec,
+    'csc': smp.csc,
+    'cot': smp.cot,
+}
+
+
+class ExpressionStore:
+    """
+    Content-addressed store of parsed sympy expressions, keyed
+    on the hash of the cleaned expression string
+    """
+
+    def __init__(self, maxsize=2048, path=None):
+        """
+        :param maxsize: max number of parsed trees held in memory
+        :param path: optional SQLite file parsed trees spill to
+        """
+
+        self.memory = ExpressionCache(maxsize=maxsize)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS exprs (key TEXT PRIMARY KEY, tree BLOB)')
+            self._db.commit()
+
+    @staticmethod
+    def make_key(expr):
+        """
+        :param expr: cleaned expression string
+        :returns: content hash of expression
+        """
+
+        return hashlib.sha1(expr.encode('utf-8')).hexdigest()
+
+    def _spilled(self, key):
+        """
+        Looks up a parsed tree in the spill file
+
+        :param key: content hash
+        :returns: sympy expression or None
+        """
+
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT tree FROM exprs WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            return None
+
+    def _spill(self, key, tree):
+        """
+        Writes a parsed tree to the spill file
+
+        :param key: content hash
+        :param tree: sympy expression
+        """
+
+        if self._db is None:
+            return
+        try:
+            blob = pickle.dumps(tree)
+        except Exception:
+            # Some trees (ex. lambdas) can't be pickled, keep in memory only
+            return
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO exprs VALUES (?, ?)', (key, blob))
+            self._db.commit()
+
+    def parse(self, expr):
+        """
+        Parses a cleaned expression string, reusing a stored tree if present
+
+        :param expr: cleaned expression string
+        :returns: sympy expression
+        """
+
+        # Already parsed
+        if isinstance(expr, smp.Basic):
+            return expr
+
+        key = self.make_key(expr)
+        tree = self.memory.get(key)
+        if tree is not None:
+            return tree
+
+        tree = self._spilled(key)
+        if tree is None:
+            tree = parse_expr(expr, local_dict=local_names)
+            self._spill(key, tree)
+        self.memory.put(key, tree)
+        return tree
+
+    def clear(self):
+        """Empties in-memory store (spill file is kept)"""
+
+        self.memory.clear()
+
+    def close(self):
+        """Closes spill file"""
+
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+
+# Shared store (set CALC_PARSE_STORE to spill parsed trees to disk)
+store = ExpressionStore(path=os.getenv('CALC_PARSE_STORE'))
+
+def parse(expr):
+    """
+    Parses a cleaned expression string through the shared store
+
+    :param expr: cleaned expression string
+    :returns: sympy expression
+    """
+
+    return store.parse(expr)
+
+
+# Test:
+if __name__ == '__main__':
+    print(parse('x**2+sec(x)*e'), parse('x**2+sec(x)*e') is parse('x**2+sec(x)*e'))
@@ -5,32 +5,227 @@ Description:
     graphs page in main.py.
 """
 
+import io
+
+import numpy as np
 import sympy as smp
+from cache import ExpressionCache
 from calculator import clean
+from expr_store import parse
+from numeric import compile_expr
 
 
 # Symbolic initialization
 x, y, z, alpha, beta = smp.symbols('x y z alpha beta', real=True)
 i, j, k = smp.symbols('i j k', integer=True, positive=True)
 
-def graph(expr):
+# Sampled (xs, ys) series, keyed by expression, x-range and sampling settings
+sample_cache = ExpressionCache(maxsize=64)
+
+def make_plot(expr):
     """
-    Graphs an expression using sympy's plot method
+    Builds a sympy plot of an expression without showing it
+    (safe to call off the gui thread)
 
     :param expr: expression to be graphed
-    :returns: graph window
+    :returns: sympy plot, or None if expression can't be graphed
     """
 
     # Cleans syntax
     expr = expr.replace(' ', '')
-    f = clean(expr)
     try:
-        plot = smp.plot(f, legend=True, show=False)
+        f = parse(clean(expr))
+        return smp.plot(f, legend=True, show=False)
     except:
+        return None
+
+def graph(expr):
+    """
+    Graphs an expression using sympy's plot method
+
+    :param expr: expression to be graphed
+    :returns: graph window
+    """
+
+    plot = make_plot(expr)
+    if plot is None:
         return
     plot.show()
 
 
+# ---------------- Headless sampling / rendering ----------------
+
+def compile_curve(expr):
+    """
+    Compiles a single variable expression into a vectorized function
+
+    :param expr: expression to be graphed
+    :returns: function mapping an array of xs to an array of float ys
+    """
+
+    func, names = compile_expr(expr)
+    if len(names) > 1:
+        raise ValueError(f'can only graph one variable, got: {", ".join(names)}')
+
+    def curve(xs):
+        with np.errstate(all='ignore'):
+            ys = np.asarray(func(xs) if names else func())
+            if np.iscomplexobj(ys):
+                # Only real parts of the graph are drawn
+                ys = np.where(np.abs(ys.imag) < 1e-12, ys.real, np.nan)
+        return np.broadcast_to(ys.astype(float), xs.shape)
+    return curve
+
+def value_span(ys):
+    """
+    Range of y values ignoring outliers (poles would dominate the full range)
+
+    :param ys: array of y values
+    :returns: positive span
+    """
+
+    finite = ys[np.isfinite(ys)]
+    if finite.size == 0:
+        return 1.0
+    low, high = np.percentile(finite, [5, 95])
+    return (high - low) or (np.abs(finite).max() or 1.0)
+
+def sample(expr, x_min=-10, x_max=10, points=200, depth=8, tol=1e-3, max_points=20000):
+    """
+    Samples an expression on a grid, adaptively adding points where the curve
+    bends sharply and breaking the line (NaN) at discontinuities
+
+    :param expr: expression to be graphed
+    :param x_min: left end of x-range
+    :param x_max: right end of x-range
+    :param points: initial uniform grid size
+    :param depth: max number of refinement passes (each halves segments)
+    :param tol: allowed midpoint error, as a fraction of the y span
+    :param max_points: stop refining past this many points
+    :returns: (xs, ys) NumPy arrays
+    """
+
+    key = (expr.replace(' ', ''), float(x_min), float(x_max), points, depth, tol, max_points)
+    cached = sample_cache.get(key)
+    if cached is not None:
+        return cached
+
+    curve = compile_curve(expr)
+    xs = np.linspace(x_min, x_max, points)
+    ys = curve(xs)
+    span = value_span(ys)
+
+    for _ in range(depth):
+        mid_xs = (xs[:-1] + xs[1:]) / 2
+        mid_ys = curve(mid_xs)
+
+        # Refine where the midpoint is off the straight line (or finite-ness changes)
+        error = np.abs(mid_ys - (ys[:-1] + ys[1:]) / 2)
+        all_nan = np.isnan(mid_ys) & np.isnan(ys[:-1]) & np.isnan(ys[1:])
+        refine = ~(error <= tol * span) & ~all_nan
+        if not refine.any() or len(xs) + refine.sum() > max_points:
+            break
+
+        at = np.nonzero(refine)[0] + 1
+        xs = np.insert(xs, at, mid_xs[refine])
+        ys = np.insert(ys, at, mid_ys[refine])
+
+    # Discontinuities: bisect big jumps toward the steeper half, a
+    # continuous curve's jump shrinks while a pole / step's doesn't
+    jumps = np.nonzero(np.abs(np.diff(ys)) > 0.05 * span)[0]
+    if jumps.size:
+        a, b = xs[jumps], xs[jumps + 1]
+        ya, yb = ys[jumps], ys[jumps + 1]
+        start = np.abs(yb - ya)
+        for _ in range(20):
+            m = (a + b) / 2
+            ym = curve(m)
+            left = ~(np.abs(ym - ya) < np.abs(yb - ym))
+            a, ya = np.where(left, a, m), np.where(left, ya, ym)
+            b, yb = np.where(left, m, b), np.where(left, ym, yb)
+        breaks = ~(np.abs(yb - ya) < 0.5 * start)
+        at = jumps[breaks] + 1
+        xs = np.insert(xs, at, (xs[at - 1] + xs[at]) / 2)
+        ys = np.insert(ys, at, np.nan)
+
+    result = (xs, ys)
+    sample_cache.put(key, result)
+    return result
+
+def make_figure(expr, x_min=-10, x_max=10, size=(6.4, 4.8), dpi=100):
+    """
+    Draws a sampled expression on an off-screen matplotlib figure
+
+    :param expr: expression to be graphed
+    :param x_min: left end of x-range
+    :param x_max: right end of x-range
+    :param size: figure size in inches
+    :param dpi: dots per inch
+    :returns: (figure, canvas)
+    """
+
+    # Agg canvas, never opens a window
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    xs, ys = sample(expr, x_min, x_max)
+    fig = Figure(figsize=size, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.axhline(0, color='#888888', linewidth=0.8)
+    ax.axvline(0, color='#888888', linewidth=0.8)
+    ax.plot(xs, ys, label=expr)
+    ax.set_xlim(x_min, x_max)
+
+    # Limits from an even grid (refined points cluster at poles), so poles don't flatten the graph
+    grid_ys = compile_curve(expr)(np.linspace(x_min, x_max, 200))
+    finite = grid_ys[np.isfinite(grid_ys)]
+    if finite.size:
+        low, high = np.percentile(finite, [2, 98])
+        margin = (high - low) * 0.25 or 1.0
+        ax.set_ylim(low - margin, high + margin)
+    ax.legend()
+    return fig, canvas
+
+def render_array(expr, x_min=-10, x_max=10, size=(6.4, 4.8), dpi=100):
+    """
+    Renders a graph to an RGBA image array
+
+    :param expr: expression to be graphed
+    :param x_min: left end of x-range
+    :param x_max: right end of x-range
+    :param size: figure size in inches
+    :param dpi: dots per inch
+    :returns: (height, width, 4) uint8 array
+    """
+
+    fig, canvas = make_figure(expr, x_min, x_max, size, dpi)
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba()).copy()
+
+def render_png(expr, x_min=-10, x_max=10, size=(6.4, 4.8), dpi=100, path=None):
+    """
+    Renders a graph to PNG
+
+    :param expr: expression to be graphed
+    :param x_min: left end of x-range
+    :param x_max: right end of x-range
+    :param size: figure size in inches
+    :param dpi: dots per inch
+    :param path: optional file to also write the PNG to
+    :returns: PNG bytes
+    """
+
+    fig, canvas = make_figure(expr, x_min, x_max, size, dpi)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    png = buffer.getvalue()
+    if path is not None:
+        with open(path, 'wb') as f:
+            f.write(png)
+    return png
+
+
 # Test:
 if __name__ == '__main__':
     expression = '4x + x^2'
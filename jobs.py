@@ -0,0 +1,175 @@
+"""
+File: jobs.py
+Description:
+    Implements a background job runner for the gui in main.py so slow
+    calculations / API calls run off the Tk main thread. Finished jobs are
+    picked up by polling with root.after, so callbacks run on the main
+    thread where it's safe to touch widgets.
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """Handle to a submitted background job"""
+
+    def __init__(self, on_done, on_error, on_chunk=None):
+        """
+        :param on_done: called with the result on the main thread
+        :param on_error: called with the exception on the main thread
+        :param on_chunk: called with each streamed chunk on the main thread
+        """
+
+        self.future = None
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_chunk = on_chunk
+        self.chunks = queue.Queue()
+        self.cancelled = False
+
+    def drain(self):
+        """Hands streamed chunks received so far to on_chunk"""
+
+        while not self.cancelled:
+            try:
+                chunk = self.chunks.get_nowait()
+            except queue.Empty:
+                return
+            self.on_chunk(chunk)
+
+    def cancel(self):
+        """
+        Cancels job, its callbacks won't run. A job already running
+        finishes in the background (threads can't be killed), use
+        calculation time budgets (timeouts.py) to bound that work.
+        """
+
+        self.cancelled = True
+        self.future.cancel()
+
+
+class JobRunner:
+    """Runs functions on worker threads, polling for results with `after`"""
+
+    def __init__(self, after, max_workers=2, poll_ms=50, on_busy=None):
+        """
+        :param after: scheduler, root.after(ms, func)
+        :param max_workers: worker thread count
+        :param poll_ms: milliseconds between result checks
+        :param on_busy: called with True / False when jobs start / all finish
+        """
+
+        self.after = after
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self.jobs = []
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._polling = False
+
+    def submit(self, func, *args, on_done=None, on_error=None):
+        """
+        Runs a function in the background
+
+        :param func: function to run
+        :param args: function arguments
+        :param on_done: called with the result on the main thread
+        :param on_error: called with the exception on the main thread
+        :returns: Job
+        """
+
+        job = Job(on_done, on_error)
+        job.future = self._pool.submit(func, *args)
+        return self._track(job)
+
+    def submit_stream(self, func, *args, on_chunk, on_done=None, on_error=None):
+        """
+        Runs a generator function in the background, handing
+        each yielded chunk to on_chunk as it arrives
+
+        :param func: generator function to run
+        :param args: function arguments
+        :param on_chunk: called with each chunk on the main thread
+        :param on_done: called with None once the generator finishes
+        :param on_error: called with the exception on the main thread
+        :returns: Job
+        """
+
+        job = Job(on_done, on_error, on_chunk)
+
+        def consume():
+            for chunk in func(*args):
+                if job.cancelled:
+                    break
+                job.chunks.put(chunk)
+
+        job.future = self._pool.submit(consume)
+        return self._track(job)
+
+    def _track(self, job):
+        """
+        Starts polling for a submitted job
+
+        :param job: Job
+        :returns: Job
+        """
+
+        self.jobs.append(job)
+        if len(self.jobs) == 1 and self.on_busy is not None:
+            self.on_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.after(self.poll_ms, self._poll)
+        return job
+
+    def cancel_all(self):
+        """Cancels every pending job"""
+
+        for job in self.jobs:
+            job.cancel()
+        if self.jobs and self.on_busy is not None:
+            self.on_busy(False)
+        self.jobs = []
+
+    def busy(self):
+        """
+        :returns: whether any job is still pending
+        """
+
+        return len(self.jobs) > 0
+
+    def _poll(self):
+        """Runs callbacks of finished jobs, reschedules itself while jobs remain"""
+
+        finished, pending = [], []
+        for job in self.jobs:
+            (finished if job.future.done() else pending).append(job)
+        self.jobs = pending
+        if self.jobs:
+            self.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+            if finished and self.on_busy is not None:
+                self.on_busy(False)
+
+        # State is settled before callbacks, a failing callback can't stall polling
+        for job in pending:
+            if job.on_chunk is not None:
+                job.drain()
+        for job in finished:
+            if job.on_chunk is not None:
+                job.drain()
+            if job.cancelled:
+                continue
+            error = job.future.exception()
+            if error is not None:
+                if job.on_error is not None:
+                    job.on_error(error)
+            elif job.on_done is not None:
+                job.on_done(job.future.result())
+
+    def shutdown(self):
+        """Cancels pending jobs and stops worker threads"""
+
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,74 @@
+"""
+File: lazy.py
+Description:
+    Implements module-level lazy loading so main.py starts without importing
+    heavy dependencies (scipy, openai, matplotlib) until a page needs them.
+    Loading time per module is kept in load_times for the startup benchmark.
+"""
+
+import importlib
+import sys
+import time
+
+
+# Module name -> seconds its first import took
+load_times = {}
+
+
+class LazyModule:
+    """Stand-in for a module, imported on first attribute access"""
+
+    def __init__(self, name):
+        """
+        :param name: module name
+        """
+
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        """
+        :returns: imported module
+        """
+
+        module = self.__dict__['_module']
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name)  # Thread safe, runs once
+            load_times.setdefault(self._name, time.perf_counter() - start)
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
+
+def lazy_import(name):
+    """
+    :param name: module name
+    :returns: module if already imported, else a LazyModule
+    """
+
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+def is_loaded(module):
+    """
+    :param module: module or LazyModule
+    :returns: whether the module has been imported
+    """
+
+    return not isinstance(module, LazyModule) or module.__dict__['_module'] is not None
+
+
+# Test:
+if __name__ == '__main__':
+    json = lazy_import('json')
+    decimal = lazy_import('decimal')
+    print(decimal, decimal.Decimal('1.5') * 2, decimal, load_times)
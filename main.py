@@ -8,11 +8,38 @@ Description:
     Complex word problem solution capabilities with utilization of ChatGPT API.
 """
 
+import argparse
+
 import customtkinter as ctk
+import profiling
 from calculator import calculate
-from vector import vector_calc
-from graph import graph
-from solver_ai import generate
+from jobs import JobRunner
+from lazy import lazy_import
+
+# Loaded on first use of their page (scipy / matplotlib / openai are slow to import)
+vector = lazy_import('vector')
+graph = lazy_import('graph')
+solver_ai = lazy_import('solver_ai')
+
+# Command line: python main.py [--profile DIR] [--profile-every N]
+parser = argparse.ArgumentParser(description='CalCulator')
+profiling.add_arguments(parser)
+args = parser.parse_args()
+profiling.configure(args.profile, args.profile_every)
+calculate = profiling.profiled('calculate', calculate)  # Unchanged unless profiling
+
+def vector_calc(*args):
+    """vector.vector_calc, without loading vector.py before the first call"""
+
+    return vector.vector_calc(*args)
+
+def make_plot(expr):
+    """graph.make_plot, without loading graph.py before the first call"""
+
+    return graph.make_plot(expr)
+
+vector_calc = profiling.profiled('vector_calc', vector_calc)
+make_plot = profiling.profiled('graph', make_plot)
 
 
 # Setup window
@@ -53,15 +80,39 @@ wp_menu.pack(padx=15, pady=(50, 30))
 main_frame = ctk.CTkFrame(root, fg_color='#3f3f3f')
 main_frame.pack(fill='x', padx=20)
 
+# Busy indicator (shown while background jobs run)
+busy_lbl = ctk.CTkLabel(menu, text='working...', font = ctk.CTkFont(size=12, slant='italic'))
+cancel_btn = ctk.CTkButton(menu, text='cancel', width=80, fg_color='#ff4f4b',
+                    command= lambda: runner.cancel_all())
+
+def show_busy(busy):
+    """
+    Shows / hides busy indicator and cancel button
 
-def calc_page():
+    :param busy: whether background jobs are running
+    """
+
+    if busy:
+        busy_lbl.pack(pady=(0, 5))
+        cancel_btn.pack()
+    else:
+        busy_lbl.pack_forget()
+        cancel_btn.pack_forget()
+
+# Slow calculations / API calls run off the Tk main thread, results posted back via root.after
+runner = JobRunner(root.after, on_busy=show_busy)
+
+
+def calc_page(page):
     """
     Creates calculator page (p.1) using customtkinter as well as implements 
     calculation functions
+
+    :param page: frame the page is built in
     """
 
     # Calculator buttons
-    top_frame = ctk.CTkFrame(main_frame, fg_color='#3f3f3f')
+    top_frame = ctk.CTkFrame(page, fg_color='#3f3f3f')
     top_frame.pack(fill='x', padx=20)
     b1_frame = ctk.CTkFrame(top_frame, fg_color='#545454')
     b1_frame.pack(fill='x', padx=(15, 15), pady=(15, 10))
@@ -93,14 +144,19 @@ def calc_page():
             # Get conditions array
             condi = [wrt.get(), lim.get(), integral_l.get(),
                           integral_r.get(), sum_i.get(), sum_n.get()]
-            result = calculate(expr, condi)
-            entrybox.delete(0, ctk.END)
 
-            if str(result) == None:
-                # Catch any errors with result
-                entrybox.insert(0, 'ERROR')
-            else:
-                entrybox.insert(0, str(result))
+            def show_result(result):
+                """Replace entrybox with answer (on main thread)"""
+
+                entrybox.delete(0, ctk.END)
+                if result == None:
+                    # Catch any errors with result
+                    entrybox.insert(0, 'ERROR')
+                else:
+                    entrybox.insert(0, str(result))
+
+            runner.submit(calculate, expr, condi, on_done=show_result,
+                          on_error=lambda e: show_result(None))
         else:
             # Add to entrybox if var buttons clicked
             entrybox.insert(ctk.END, value) 
@@ -162,7 +218,7 @@ def calc_page():
 
 
     # Conditional select
-    mid_frame = ctk.CTkFrame(main_frame, border_width=5)
+    mid_frame = ctk.CTkFrame(page, border_width=5)
     mid_frame.pack(padx=140, pady=(20,5), fill='both')
     vars_title = ctk.CTkLabel(mid_frame, text='Conditions:', font=ctk.CTkFont(weight='bold'))
     vars_title.pack(pady=(5, 10))
@@ -200,12 +256,12 @@ def calc_page():
     sum_n.pack(side='left', pady=(0, 15), padx=(0, 15))
 
     # EntryBox
-    entrybox = ctk.CTkEntry(main_frame, width=700, height=100, font=ctk.CTkFont(size=30))
+    entrybox = ctk.CTkEntry(page, width=700, height=100, font=ctk.CTkFont(size=30))
     entrybox.pack(pady=(30, 15))
 
     # Calculate / clear buttons
-    calc_btn = ctk.CTkButton(main_frame, text='calculate', command = lambda: click_button('calculate'))
-    clear_btn = ctk.CTkButton(main_frame, text='clear', fg_color='#ff4f4b', command = lambda: click_button('clear'))
+    calc_btn = ctk.CTkButton(page, text='calculate', command = lambda: click_button('calculate'))
+    clear_btn = ctk.CTkButton(page, text='clear', fg_color='#ff4f4b', command = lambda: click_button('clear'))
     calc_btn.pack(padx=150, fill='x', pady=(5, 20))
     clear_btn.pack(pady=(0, 20))
 
@@ -213,25 +269,28 @@ def calc_page():
 # Initialize entryboxes for vector_page to be accessed in build()
 a_entry, b_entry, result_entry = None, None, None
 
-def vector_page():
-    """Creates vector function page (p.2) using customtkinter and handles input"""
+def vector_page(page):
+    """
+    Creates vector function page (p.2) using customtkinter and handles input
+
+    :param page: frame the page is built in
+    """
 
     # Choose operation menu drop-down
-    fnction_lst = ['[select]', 'vector addition', 'dot product', 'cross product', 'projection', 
-                   'determinant', 'norm of vector', 'arc length', 'derivative']
-    vector_title = ctk.CTkLabel(main_frame, text='Vector Calculator', 
+    fnction_lst = ['[select]'] + [op.label for op in vector.operations]
+    vector_title = ctk.CTkLabel(page, text='Vector Calculator', 
                                 font = ctk.CTkFont(weight='bold', size=40))
-    drop_frame = ctk.CTkFrame(main_frame, border_width=5, width=100, height=50, fg_color='#545454')
+    drop_frame = ctk.CTkFrame(page, border_width=5, width=100, height=50, fg_color='#545454')
     drop_title = ctk.CTkLabel(drop_frame, text='Choose Operation:', 
                               font=ctk.CTkFont(weight='bold', size=15))
     vector_drop = ctk.CTkComboBox(drop_frame, values=fnction_lst, width=200)  # Drop down select
-    func_frame = ctk.CTkFrame(main_frame, border_width=5, height=240)
+    func_frame = ctk.CTkFrame(page, border_width=5, height=240)
     reset_btn = ctk.CTkButton(drop_frame, text='reset', width=40, fg_color='#36454f', 
                               font=ctk.CTkFont(size=10, weight='bold'), command = lambda: reset())
     choose_btn = ctk.CTkButton(drop_frame, text='☑', width=40, command = lambda: select())  # Choose from drop down
-    calc_btn = ctk.CTkButton(main_frame, text='calculate', width=400,
+    calc_btn = ctk.CTkButton(page, text='calculate', width=400,
                              command = lambda: calc(vector_drop.get()))  # Calculate (based on drop down)
-    clear_btn = ctk.CTkButton(main_frame, text='clear', fg_color='#ff4f4b', width=100, 
+    clear_btn = ctk.CTkButton(page, text='clear', fg_color='#ff4f4b', width=100, 
                               command = lambda: clear())
 
     vector_title.pack(fill='x', padx=20, pady=(30, 0))
@@ -247,27 +306,47 @@ def vector_page():
     # Initialize frames housing input data for different functions
     vec_frame = ctk.CTkFrame(func_frame)
 
+    # Function frames built so far, menu label -> (frame, a_entry, b_entry, result_entry)
+    op_frames = {}
+
+    # Calculations submitted from this page, reset cancels only these
+    jobs = []
+
     def select():
-        """Pack initialized frames and build function"""
+        """Pack function frame, building it on first select"""
+
+        global a_entry, b_entry, result_entry
 
         # Only when functions are selected in drop-down
-        if vector_drop.get() != '[select]':
-            vec_frame.pack(padx=(10, 10), pady=10, fill='x', side='left')  # Pack frames
-            build(vector_drop.get())  # Call build
+        drop_type = vector_drop.get()
+        if vector.operations.by_label(drop_type) is None:
+            return
+        if drop_type not in op_frames:
+            op_frames[drop_type] = build(drop_type)  # Call build
+
+        hide_frames(vec_frame)
+        op_frame, a_entry, b_entry, result_entry = op_frames[drop_type]
+        vec_frame.pack(padx=(10, 10), pady=10, fill='x', side='left')  # Pack frames
+        op_frame.pack(fill='x')
 
     def reset():
         """Resets entire page for new select"""
 
-        delete_frames(main_frame)
-        vector_page()  # Rebuild to base page
+        for job in jobs:
+            job.cancel()
+        jobs.clear()
+        for op_frame, *entries in op_frames.values():
+            clear_entries(*entries)
+        hide_frames(vec_frame)
+        vec_frame.pack_forget()
+        vector_drop.set('[select]')  # Back to base page
 
     def clear():
         """Clear all input fields in vec_frame (housing user text input)"""
 
         # Only when functions are selected in drop-down
-        if vector_drop.get() != '[select]':
-            delete_frames(vec_frame)
-            build(vector_drop.get())  # Doesn't rebuild the select frame
+        if vector_drop.get() in op_frames:
+            clear_entries(a_entry, b_entry, result_entry)
 
     def calc(func_selected):
         """
@@ -280,52 +359,69 @@ def vector_page():
         # Clear entry to prep for new entry insertion
         result_entry.delete(0, ctk.END)
         
-        # Insert vector_calc calculation depending on current selected function
-        if func_selected == 'vector addition':
-            result_entry.insert(0, str(vector_calc('add', a_entry.get(), b_entry.get())))
-        elif func_selected == 'dot product':
-            result_entry.insert(0, str(vector_calc('dot', a_entry.get(), b_entry.get())))
-        elif func_selected == 'cross product':
-            result_entry.insert(0, str(vector_calc('cross', a_entry.get(), b_entry.get())))
-        elif func_selected == 'determinant':
-            result_entry.insert(0, str(vector_calc('det', a_entry.get())))
-        elif func_selected == 'norm of vector':
-            result_entry.insert(0, str(vector_calc('norm', a_entry.get())))
-        elif func_selected == 'arc length':
-            result_entry.insert(0, str(vector_calc('length', a_entry.get())))
-        elif func_selected == 'derivative':
-            result_entry.insert(0, str(vector_calc('deriv', a_entry.get())))
+        # vector_calc arguments depending on current selected function
+        op = vector.operations.by_label(func_selected)
+        if op is None:
+            return
+        args = (op.name, a_entry.get())
+        if op.arity == 2 or op.optional:
+            args += (b_entry.get(),)  # Second vector, or optional bounds / order (blank = default)
+
+        # Insert calculation once finished (entry captured in case another function is selected)
+        entry = result_entry
+        jobs[:] = [job for job in jobs if not job.future.done()]
+        jobs.append(runner.submit(vector_calc, *args, on_done=lambda result: entry.insert(0, str(result)),
+                                  on_error=lambda e: entry.insert(0, 'ERROR')))
 
     def build(drop_type):
         """
         Build interior function frames based on function selection
 
         :param drop_type: string of operation name from fnction_lst
+        :returns: (function frame, a_entry, b_entry or None, result_entry)
         """
 
-        # Globalize pre-initialized entryboxes to be accessed outside of following if statements
-        global a_entry, b_entry, result_entry
-
+        op_frame = ctk.CTkFrame(vec_frame)
+        b_entry = None
 
         # Hashmap of all function labels
         lbls = {'vector addition': 'a + b  = ', 
+                'vector subtraction': 'a - b  = ', 
                 'dot product': 'a * b  = ', 
                 'cross product': 'a x b  = ', 
                 'projection': 'proj  = ',
                 'determinant': 'det  =',
                 'norm of vector': '||a||  =',
                 'arc length': 'L  =',
-                'derivative': 'deriv  ='}
+                'derivative': 'deriv  =',
+                'matrix multiply': 'A B  =',
+                'solve Ax = b': 'x  =',
+                'inverse': 'A⁻¹  =',
+                'rank': 'rank  =',
+                'eigenvalues': 'λ  =',
+                'LU': 'P, L, U  =',
+                'QR': 'Q, R  =',
+                'SVD': 'U, S, Vh  =',
+                'gradient': '∇f  =',
+                'divergence': '∇ · F  =',
+                'curl': '∇ x F  =',
+                'jacobian': 'J  ='}
         
-        # Frame / page structure for vector addition, dot product, cross product, and projection function selections
-        if drop_type == 'vector addition' or drop_type == 'dot product' or \
-            drop_type =='cross product' or drop_type == 'projection':
+        # Optional operand of one operand operations -> (label, placeholder)
+        optional_lbls = {'arc length': ('t  =', '0, 1'),
+                         'derivative': ('order  =', '1')}
+
+        op = vector.operations.by_label(drop_type)
+        result_text = lbls.get(drop_type, op.name + '  =')
+
+        # Frame / page structure for two operand operations (vector addition, dot product, ...)
+        if op.arity == 2:
             
-            seper_1 = ctk.CTkFrame(vec_frame, width=450, height=50)
-            seper_2 = ctk.CTkFrame(vec_frame, width=450, height=50)
-            result_entry = ctk.CTkEntry(vec_frame, width=520, height=40, border_width=3, font = ctk.CTkFont(size=20),
+            seper_1 = ctk.CTkFrame(op_frame, width=450, height=50)
+            seper_2 = ctk.CTkFrame(op_frame, width=450, height=50)
+            result_entry = ctk.CTkEntry(op_frame, width=520, height=40, border_width=3, font = ctk.CTkFont(size=20),
                                   fg_color='#222222', text_color='white')
-            result_lbl = ctk.CTkLabel(vec_frame, text=lbls[drop_type], font = ctk.CTkFont(weight='bold', size=18))
+            result_lbl = ctk.CTkLabel(op_frame, text=result_text, font = ctk.CTkFont(weight='bold', size=18))
             vec_a = ctk.CTkLabel(seper_1, text='a  =')
             vec_b = ctk.CTkLabel(seper_2, text='b  =')
             a_entry = ctk.CTkEntry(seper_1, width=200, height=30)
@@ -339,33 +435,47 @@ def vector_page():
             vec_b.pack(padx=(20, 10), pady=10, side='left')
             b_entry.pack(padx=(0, 20), pady=10, side='left')
         
-        # Frame / page structure for determinant, norm of vector, arc length, and derivative function selections
-        elif drop_type == 'determinant' or drop_type == 'norm of vector' or \
-            drop_type == 'arc length' or drop_type == 'derivative':
+        # Frame / page structure for one operand operations (determinant, norm of vector, ...)
+        else:
 
-            seper = ctk.CTkFrame(vec_frame, width=450, height=50)
-            result_entry = ctk.CTkEntry(vec_frame, width=520, height=40, border_width=3, font = ctk.CTkFont(size=20),
+            seper = ctk.CTkFrame(op_frame, width=450, height=50)
+            result_entry = ctk.CTkEntry(op_frame, width=520, height=40, border_width=3, font = ctk.CTkFont(size=20),
                                   fg_color='#222222', text_color='white')
-            result_lbl = ctk.CTkLabel(vec_frame, text=lbls[drop_type], font = ctk.CTkFont(weight='bold', size=18))
+            result_lbl = ctk.CTkLabel(op_frame, text=result_text, font = ctk.CTkFont(weight='bold', size=18))
             vec_lbl = ctk.CTkLabel(seper, text='v  =')
             a_entry = ctk.CTkEntry(seper, width=200, height=30)
-            seper.pack(padx=120, pady=(70, 40))
+            if op.optional:
+                # Bounds / order entry (arc length, derivative), left blank for the default
+                opt_text, placeholder = optional_lbls.get(drop_type, ('b  =', ''))
+                opt_seper = ctk.CTkFrame(op_frame, width=450, height=50)
+                opt_lbl = ctk.CTkLabel(opt_seper, text=opt_text)
+                b_entry = ctk.CTkEntry(opt_seper, width=200, height=30, placeholder_text=placeholder)
+                seper.pack(padx=120, pady=20)
+                opt_seper.pack(padx=120, pady=(0, 20))
+                opt_lbl.pack(padx=(20, 10), pady=10, side='left')
+                b_entry.pack(padx=(0, 20), pady=10, side='left')
+            else:
+                seper.pack(padx=120, pady=(70, 40))
             result_lbl.pack(padx=(40, 10), pady=(0, 17), side='left')
             result_entry.pack(padx=(0, 60), pady=(0, 20))
             vec_lbl.pack(padx=(20, 10), pady=10, side='left')
             a_entry.pack(padx=(0, 20), side='left')
 
+        return op_frame, a_entry, b_entry, result_entry
+
 
-def graphs_page():
+def graphs_page(page):
     """
     Creates graph page (p.3) using customtkinter 
     to represent graphs from user input functions
+
+    :param page: frame the page is built in
     """
 
     # f(x) entrybox
-    graph_title = ctk.CTkLabel(main_frame, text='function:', 
+    graph_title = ctk.CTkLabel(page, text='function:', 
                                font = ctk.CTkFont(size=20, weight='bold'))
-    func_frame = ctk.CTkFrame(main_frame, height=50, fg_color='#545454', 
+    func_frame = ctk.CTkFrame(page, height=50, fg_color='#545454', 
                               border_width=3, border_color='#aaaaaa')
     f_enter = ctk.CTkButton(func_frame, text='☑', width=40, 
                             command = lambda: draw(f_entry.get()))
@@ -387,11 +497,25 @@ def graphs_page():
         """
 
         f_entry.delete(0, ctk.END)
-        graph(expr)
 
+        def show_plot(plot):
+            """Open graph window (windows must be opened on main thread)"""
+
+            if plot is not None:
+                plot.show()
+
+        runner.submit(make_plot, expr, on_done=show_plot)
 
-def wp_page():
-    """Creates word problem page (p.4) using costumtkinter"""
+
+def wp_page(page):
+    """
+    Creates word problem page (p.4) using costumtkinter
+
+    :param page: frame the page is built in
+    """
+
+    # Answer still streaming in, cancelled when solve is clicked again
+    streaming = None
 
     def solve():
         """
@@ -399,22 +523,27 @@ def wp_page():
         inserting answer statement into chat_text entrybox
         """
 
+        nonlocal streaming
+        if streaming is not None:
+            streaming.cancel()
         chat_text.delete('1.0', 'end-1c')
         problem = problem_text.get('1.0', 'end-1c')
-        answer = generate(problem)
-        chat_text.insert('1.0', answer)
+        # Append answer as it streams in
+        streaming = runner.submit_stream(solver_ai.generate_stream, problem,
+                                         on_chunk=lambda text: chat_text.insert('end', text),
+                                         on_error=lambda e: chat_text.insert('end', f'\nERROR: {e}'))
 
     # Construct page
-    problem_lbl = ctk.CTkLabel(main_frame, text='Enter Problem:', font = ctk.CTkFont(size=15, weight='bold'))
-    problem_text = ctk.CTkTextbox(main_frame, border_width=5, width=600, height=110, font = ctk.CTkFont(size=20))
-    enter_btn = ctk.CTkButton(main_frame, text='solve', command = lambda: solve())
+    problem_lbl = ctk.CTkLabel(page, text='Enter Problem:', font = ctk.CTkFont(size=15, weight='bold'))
+    problem_text = ctk.CTkTextbox(page, border_width=5, width=600, height=110, font = ctk.CTkFont(size=20))
+    enter_btn = ctk.CTkButton(page, text='solve', command = lambda: solve())
     problem_lbl.pack(pady=(20, 10))
     problem_text.configure(spacing1=5, spacing2=5)
     problem_text.pack(padx=30)
     problem_text.mark_set('insert', '1.0')
     enter_btn.pack(pady=(10, 10), fill='x', padx=110)
 
-    chat_text = ctk.CTkTextbox(main_frame, border_width=5, width=500, height=245, font = ctk.CTkFont(size=20))
+    chat_text = ctk.CTkTextbox(page, border_width=5, width=500, height=245, font = ctk.CTkFont(size=20))
     chat_text.configure(spacing1=5, spacing2=5)
     chat_text.pack(padx=50, pady=(35, 40))
     chat_text.mark_set('insert', '1.0')
@@ -430,16 +559,27 @@ def reset_indicators():
     graph_menu.configure(fg_color='#253da1', border_width=0)
     wp_menu.configure(fg_color='#253da1', border_width=0)
 
-def delete_frames(frame):
-    """Destroy frame when switching page"""
+def hide_frames(frame):
+    """Unpack frames inside frame (kept for reuse) when switching page"""
+
+    # Only the shown frame is packed
+    for f in frame.pack_slaves():
+        f.pack_forget()
+
+def clear_entries(*entries):
+    """Empty entryboxes, skipping None"""
+
+    for entry in entries:
+        if entry is not None:
+            entry.delete(0, ctk.END)
 
-     # Loops through all frames in main_frame
-    for f in frame.winfo_children():
-        f.destroy()
+# Pages built so far, page function -> frame
+pages = {}
 
 def indicate(menu, page):
     """
-    Switches pages and updates button color
+    Switches pages and updates button color, each page is built once
+    and keeps its entries / running calculations while hidden
 
     :param menu: selected menu button
     :param page: page connected to selected menu button
@@ -447,8 +587,11 @@ def indicate(menu, page):
 
     reset_indicators()
     menu.configure(fg_color='#624aa1', border_width=3)  # Change selected button to purple
-    delete_frames(main_frame)
-    page()  # Calls page's function
+    hide_frames(main_frame)
+    if page not in pages:
+        pages[page] = ctk.CTkFrame(main_frame, fg_color='#3f3f3f')
+        page(pages[page])  # Calls page's function
+    pages[page].pack(fill='both', expand=True)
 
 
 # Create & run window:
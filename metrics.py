@@ -0,0 +1,337 @@
+"""
+File: metrics.py
+Description:
+    Implements opt-in per-stage timing for calculator.calculate and
+    vector.vector_calc: duration of each stage (clean, evaluation, str,
+    post_clean, ...), expression size and result size of every call,
+    aggregated per operation and outcome (cache 'hit' / 'miss' for
+    calculate, 'ok' / 'error' for vector_calc) into counts and p50 / p95 / p99.
+
+    Off by default. Set CALC_METRICS=1 to record, or CALC_METRICS_FILE to
+    a path to record and write a Prometheus text dump there at exit.
+    Calls run in worker processes (executor.py) are recorded there.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+
+quantiles = (0.5, 0.95, 0.99)
+
+def percentile(values, q):
+    """
+    :param values: sorted list of numbers
+    :param q: quantile, 0-1
+    :returns: nearest-rank percentile (0 for no values)
+    """
+
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Series:
+    """Count / sum of a measurement plus a window of recent values for percentiles"""
+
+    def __init__(self, window):
+        """
+        :param window: recent values kept for percentiles
+        """
+
+        self.count = 0
+        self.total = 0
+        self.values = deque(maxlen=window)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.values.append(value)
+
+    def summary(self):
+        """
+        :returns: dict of count, sum, p50, p95, p99
+        """
+
+        values = sorted(self.values)
+        stats = {'count': self.count, 'sum': self.total}
+        for q in quantiles:
+            stats[f'p{round(q * 100)}'] = percentile(values, q)
+        return stats
+
+
+class _Stage:
+    """Context manager adding its duration to a trace"""
+
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stages = self.trace.stages
+        stages[self.name] = stages.get(self.name, 0) + time.perf_counter() - self.start
+        return False
+
+
+class Trace:
+    """Stage timings of one call"""
+
+    def __init__(self, recorder, kind):
+        """
+        :param recorder: Recorder the call is recorded into
+        :param kind: call type ('calculate' or 'vector_calc')
+        """
+
+        self.recorder = recorder
+        self.kind = kind
+        self.operation = 'unknown'
+        self.outcome = 'ok'
+        self.stages = {}
+        self.start = time.perf_counter()
+
+    def stage(self, name):
+        """
+        :param name: stage name
+        :returns: context manager timing the stage
+        """
+
+        return _Stage(self, name)
+
+    def finish(self, expr_size=0, result_size=0):
+        """
+        Records the call
+
+        :param expr_size: input size (characters)
+        :param result_size: result size (characters, or elements for arrays)
+        """
+
+        self.stages['total'] = time.perf_counter() - self.start
+        self.recorder.record(self.kind, self.operation, self.stages, expr_size, result_size, self.outcome)
+
+
+class _NullStage:
+    """Context manager doing nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullTrace:
+    """Trace handed out while recording is off, every method does nothing"""
+
+    operation = None
+    outcome = None
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def finish(self, expr_size=0, result_size=0):
+        pass
+
+    def __setattr__(self, attr, value):
+        pass
+
+null_trace = NullTrace()
+
+
+class Recorder:
+    """Aggregates call traces per (kind, operation, outcome)"""
+
+    def __init__(self, window=10000):
+        """
+        :param window: recent values kept per measurement for percentiles
+        """
+
+        self.window = window
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, operation, stages, expr_size, result_size, outcome='ok'):
+        """
+        :param kind: call type
+        :param operation: operation name
+        :param stages: dict of stage -> seconds
+        :param expr_size: input size
+        :param result_size: result size
+        :param outcome: how the call ended, ex. 'hit' / 'miss', 'ok' / 'error'
+        """
+
+        with self._lock:
+            call = self.calls.get((kind, operation, outcome))
+            if call is None:
+                call = self.calls[(kind, operation, outcome)] = {'stages': {}, 'expr_size': Series(self.window),
+                                                        'result_size': Series(self.window)}
+            for name, seconds in stages.items():
+                series = call['stages'].get(name)
+                if series is None:
+                    series = call['stages'][name] = Series(self.window)
+                series.add(seconds)
+            call['expr_size'].add(expr_size)
+            call['result_size'].add(result_size)
+
+    def summary(self):
+        """
+        :returns: {kind: {operation: {outcome: {'count', 'stages': {stage: stats}, 'expr_size', 'result_size'}}}},
+                  stats being dicts of count, sum, p50, p95, p99
+        """
+
+        with self._lock:
+            out = {}
+            for (kind, operation, outcome), call in self.calls.items():
+                out.setdefault(kind, {}).setdefault(operation, {})[outcome] = {
+                    'count': call['stages']['total'].count,
+                    'stages': {name: series.summary() for name, series in call['stages'].items()},
+                    'expr_size': call['expr_size'].summary(),
+                    'result_size': call['result_size'].summary(),
+                }
+            return out
+
+    def prometheus(self):
+        """
+        :returns: Prometheus text exposition of every measurement
+        """
+
+        lines = []
+
+        def summary_lines(metric, labels, stats):
+            for q in quantiles:
+                lines.append(f'{metric}{{{labels},quantile="{q}"}} {stats[f"p{round(q * 100)}"]!r}')
+            lines.append(f'{metric}_sum{{{labels}}} {stats["sum"]!r}')
+            lines.append(f'{metric}_count{{{labels}}} {stats["count"]}')
+
+        summary = self.summary()
+        calls = [(label_text(kind=kind, operation=op, outcome=outcome), call)
+                 for kind, ops in summary.items() for op, outcomes in ops.items()
+                 for outcome, call in outcomes.items()]
+
+        lines += ['# HELP calc_calls_total Calculations per operation', '# TYPE calc_calls_total counter']
+        for labels, call in calls:
+            lines.append(f'calc_calls_total{{{labels}}} {call["count"]}')
+
+        lines += ['# HELP calc_stage_seconds Duration of each calculation stage',
+                  '# TYPE calc_stage_seconds summary']
+        for labels, call in calls:
+            for stage, stats in call['stages'].items():
+                summary_lines('calc_stage_seconds', f'{labels},{label_text(stage=stage)}', stats)
+
+        for metric, field, help_text in (
+                ('calc_expr_size', 'expr_size', 'Input size (characters)'),
+                ('calc_result_size', 'result_size', 'Result size (characters, or elements for arrays)')):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} summary']
+            for labels, call in calls:
+                summary_lines(metric, labels, call[field])
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Forgets every recorded call"""
+
+        with self._lock:
+            self.calls = {}
+
+def label_text(**labels):
+    """
+    :param labels: label name -> value
+    :returns: Prometheus label list, ex. 'kind="calculate",operation="d/dx",outcome="hit"'
+    """
+
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+def size_of(value):
+    """
+    :param value: expression / result
+    :returns: characters for strings, elements for arrays (summed over tuples), 0 for None
+    """
+
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(size_of(v) for v in value)
+    size = getattr(value, 'size', None)  # ndarray / numpy scalar
+    if isinstance(size, int):
+        return size
+    try:
+        return len(value)
+    except TypeError:
+        return 1
+
+
+# Shared recorder (CALC_METRICS=1 records, CALC_METRICS_FILE also dumps at exit)
+recorder = Recorder()
+metrics_file = os.getenv('CALC_METRICS_FILE')
+enabled = bool(metrics_file) or os.getenv('CALC_METRICS', '') not in ('', '0')
+
+def enable(on=True):
+    """
+    :param on: turn recording on / off
+    """
+
+    global enabled
+    enabled = on
+
+def start(kind):
+    """
+    Starts timing a call
+
+    :param kind: call type
+    :returns: Trace, or null_trace when recording is off
+    """
+
+    return Trace(recorder, kind) if enabled else null_trace
+
+def summary():
+    """
+    :returns: recorder summary (see Recorder.summary)
+    """
+
+    return recorder.summary()
+
+def prometheus():
+    """
+    :returns: Prometheus text exposition
+    """
+
+    return recorder.prometheus()
+
+def dump(path=None):
+    """
+    Writes the Prometheus text exposition to a file
+
+    :param path: file path (defaults to CALC_METRICS_FILE)
+    """
+
+    path = path or metrics_file
+    if path is None:
+        raise ValueError('no metrics file given (set CALC_METRICS_FILE)')
+    with open(path, 'w') as f:
+        f.write(prometheus())
+
+if metrics_file:
+    atexit.register(dump)
+
+
+# Test:
+if __name__ == '__main__':
+    enable()
+    trace = start('calculate')
+    trace.operation = 'd/dx'
+    trace.outcome = 'miss'
+    with trace.stage('clean'):
+        time.sleep(0.01)
+    trace.finish(10, 5)
+    print(prometheus())
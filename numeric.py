@@ -0,0 +1,68 @@
+"""
+File: numeric.py
+Description:
+    Implements a numeric fast path for calculator.py expressions. The cleaned
+    expression is compiled once with sympy's lambdify (NumPy backend) and
+    evaluated over arrays of inputs, skipping symbolic evaluation entirely.
+"""
+
+import numpy as np
+import sympy as smp
+
+from cache import ExpressionCache
+from calculator import clean
+from expr_store import parse
+
+
+# Compiled functions, keyed by space-stripped expression
+compiled_cache = ExpressionCache(maxsize=256)
+
+def compile_expr(expr):
+    """
+    Compiles an expression into a NumPy function, reusing
+    a cached compiled function if present
+
+    :param expr: user input expression
+    :returns: (function, list of variable names in argument order)
+    """
+
+    key = expr.replace(' ', '')
+    compiled = compiled_cache.get(key)
+    if compiled is not None:
+        return compiled
+
+    tree = parse(clean(key))
+    symbols = sorted(tree.free_symbols, key=lambda s: s.name)
+    func = smp.lambdify(symbols, tree, 'numpy')
+    compiled = (func, [s.name for s in symbols])
+    compiled_cache.put(key, compiled)
+    return compiled
+
+def evaluate(expr, **values):
+    """
+    Numerically evaluates an expression, vectorized over array inputs
+
+    :param expr: user input expression
+    :param values: variable name -> number or array of numbers (ex. x=np.linspace(0, 1, 100))
+    :returns: NumPy array of values (0-d for scalar inputs)
+    """
+
+    func, names = compile_expr(expr)
+    missing = [name for name in names if name not in values]
+    if missing:
+        raise ValueError(f'missing values for: {", ".join(missing)}')
+
+    args = [np.asarray(values[name], dtype=float) for name in names]
+    result = np.asarray(func(*args))
+
+    # Constant expressions (ex. '2 + 0x' simplifies to 2) don't broadcast over inputs by themselves
+    if values and result.ndim == 0:
+        shape = np.broadcast_shapes(*(np.shape(value) for value in values.values()))
+        result = np.broadcast_to(result, shape).copy()
+    return result
+
+
+# Test:
+if __name__ == '__main__':
+    print(evaluate('sin(π/2) + 2'))
+    print(evaluate('x^2 + 3x', x=np.linspace(0, 1, 5)))
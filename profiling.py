@@ -0,0 +1,264 @@
+"""
+File: profiling.py
+Description:
+    Implements an opt-in profiling mode for slow sympy paths. Wrapped calls
+    (calculate, vector_calc, graph) run under cProfile plus a stack sampler,
+    and the results are written per call name to an output directory:
+
+        <name>.pstats     cProfile stats (python -m pstats, snakeviz, ...)
+        <name>.collapsed  sampled stacks, one 'root;...;leaf count' line per
+                          stack, for flamegraph.pl / speedscope / inferno
+
+    Enable with CALC_PROFILE=<dir> (CALC_PROFILE_EVERY=N profiles every Nth
+    call only), or --profile DIR / --profile-every N on main.py and batch.py.
+    Only one call is profiled at a time, calls that overlap run unprofiled.
+"""
+
+import atexit
+import cProfile
+import functools
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+
+# Seconds between stack samples
+interval = 0.002
+
+# Profiled calls between writing files (also written at exit)
+flush_every = 20
+
+
+class Session:
+    """Accumulated profile of one call name"""
+
+    def __init__(self, name):
+        """
+        :param name: call name, used for file names
+        """
+
+        self.name = name
+        self.calls = 0
+        self.profiled = 0
+        self.stats = None
+        self.stacks = Counter()
+
+
+class StackSampler(threading.Thread):
+    """Samples a thread's python stack until stopped"""
+
+    def __init__(self, thread_id, stacks):
+        """
+        :param thread_id: thread to sample
+        :param stacks: Counter collapsed stacks are added to
+        """
+
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.stacks = stacks
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            root = None
+            # Leaf up to the profiled call, frames above it are the caller's
+            while frame is not None and frame.f_code is not _run.__code__:
+                root = frame.f_code
+                names.append(f'{root.co_name} ({os.path.basename(root.co_filename)}:{root.co_firstlineno})')
+                frame = frame.f_back
+            # Skip samples taken once the call returned and is stopping this thread
+            if names and root is not StackSampler.stop.__code__:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Profiler:
+    """Profiles every Nth call per name, one call at a time"""
+
+    def __init__(self, out_dir=None, every=1):
+        """
+        :param out_dir: directory files are written to (None = off)
+        :param every: profile every Nth call of each name
+        """
+
+        self.out_dir = out_dir
+        self.every = max(1, every)
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+
+    def session(self, name):
+        """
+        :param name: call name
+        :returns: Session
+        """
+
+        with self._lock:
+            if name not in self.sessions:
+                self.sessions[name] = Session(name)
+            return self.sessions[name]
+
+    def should_profile(self, session):
+        """
+        Counts a call, picking every Nth for profiling
+
+        :param session: Session of the call
+        :returns: whether to profile it (release _busy afterwards)
+        """
+
+        with self._lock:
+            session.calls += 1
+            if (session.calls - 1) % self.every:
+                return False
+        return self._busy.acquire(blocking=False)
+
+    def record(self, session, profile, stacks):
+        """
+        Adds a profiled call to its session
+
+        :param session: Session
+        :param profile: finished cProfile.Profile
+        :param stacks: Counter of sampled stacks
+        """
+
+        with self._lock:
+            if session.stats is None:
+                session.stats = pstats.Stats(profile)
+            else:
+                session.stats.add(profile)
+            session.stacks.update(stacks)
+            session.profiled += 1
+            due = session.profiled % flush_every == 0
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Writes .pstats / .collapsed files of every session"""
+
+        if self.out_dir is None:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        with self._lock:
+            for session in self.sessions.values():
+                if session.stats is None:
+                    continue
+                base = os.path.join(self.out_dir, session.name)
+                session.stats.dump_stats(base + '.pstats')
+                with open(base + '.collapsed', 'w') as f:
+                    for stack, count in session.stacks.most_common():
+                        f.write(f'{stack} {count}\n')
+
+def _run(profiler, session, func, args, kwargs):
+    """
+    Runs a call under cProfile and the stack sampler
+
+    :param profiler: Profiler
+    :param session: Session of the call
+    :param func: function to run
+    :param args: positional arguments
+    :param kwargs: keyword arguments
+    :returns: function result
+    """
+
+    profile = cProfile.Profile()
+    stacks = Counter()
+    sampler = StackSampler(threading.get_ident(), stacks)
+    try:
+        sampler.start()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            sampler.stop()
+            profiler.record(session, profile, stacks)
+    finally:
+        profiler._busy.release()
+
+
+# Shared profiler (CALC_PROFILE=<dir> turns it on, CALC_PROFILE_EVERY=N samples every Nth call)
+profiler = Profiler()
+
+def configure(out_dir=None, every=None):
+    """
+    Turns profiling on, command line flags take precedence over environment variables
+
+    :param out_dir: output directory (defaults to CALC_PROFILE, None leaves profiling off)
+    :param every: profile every Nth call (defaults to CALC_PROFILE_EVERY or 1)
+    """
+
+    profiler.out_dir = out_dir or os.getenv('CALC_PROFILE') or None
+    profiler.every = max(1, every or int(os.getenv('CALC_PROFILE_EVERY', 1)))
+
+def enabled():
+    """
+    :returns: whether profiling is on
+    """
+
+    return profiler.out_dir is not None
+
+def profiled(name, func):
+    """
+    Wraps a function so its calls are profiled while profiling is on
+
+    :param name: call name, used for file names (ex. 'calculate')
+    :param func: function to wrap
+    :returns: wrapped function, or func itself while profiling is off
+    """
+
+    if not enabled():
+        return func
+    session = profiler.session(name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.should_profile(session):
+            return func(*args, **kwargs)
+        return _run(profiler, session, func, args, kwargs)
+    return wrapper
+
+def patch(module, attr, name=None):
+    """
+    Replaces a module function with its profiled version, so callers
+    looking it up through the module are profiled too
+
+    :param module: module
+    :param attr: function name
+    :param name: call name (defaults to attr)
+    """
+
+    setattr(module, attr, profiled(name or attr, getattr(module, attr)))
+
+def add_arguments(parser):
+    """
+    Adds --profile / --profile-every flags to an argparse parser
+
+    :param parser: argparse.ArgumentParser
+    """
+
+    parser.add_argument('--profile', metavar='DIR',
+                        help='write cProfile .pstats / collapsed stack files here (or set CALC_PROFILE)')
+    parser.add_argument('--profile-every', type=int, metavar='N',
+                        help='profile only every Nth call (or set CALC_PROFILE_EVERY)')
+
+atexit.register(profiler.flush)
+configure()
+
+
+# Test:
+if __name__ == '__main__':
+    import tempfile
+    configure(tempfile.mkdtemp())
+    slow = profiled('slow', lambda n: sum(i * i for i in range(n)))
+    for _ in range(3):
+        slow(10 ** 6)
+    profiler.flush()
+    print(profiler.out_dir, os.listdir(profiler.out_dir))
+    print(open(os.path.join(profiler.out_dir, 'slow.collapsed')).read()[:300])
@@ -0,0 +1,150 @@
+"""
+File: registry.py
+Description:
+    Implements an operation registry (name -> handler) shared by
+    calculator.py, vector.py and the gui in main.py, so an operation is
+    added in one place. Each operation also records its operand count, an
+    input parser and a cost class the schedulers read for pooling /
+    time budgets.
+"""
+
+
+# Cost classes, cheapest first
+#   cheap: numeric, microseconds to milliseconds, not worth a worker process
+#   symbolic: sympy work, unbounded, worth a worker process and a time budget
+#   heavy: dense linear algebra, O(n^3) in the operand size
+cost_classes = ('cheap', 'symbolic', 'heavy')
+
+
+class Operation:
+    """A registered operation"""
+
+    def __init__(self, name, handler, arity=1, optional=0, parser=None, cost='cheap', label=None,
+                 budget=None):
+        """
+        :param name: operation name used by callers (ex. 'cross', '∫')
+        :param handler: function doing the operation
+        :param arity: number of required operands
+        :param optional: number of optional operands after the required ones
+        :param parser: converts each required operand before the handler (None passes raw input)
+        :param cost: cost class (see cost_classes)
+        :param label: display name for menus (defaults to name)
+        :param budget: time budget type in timeouts.py (None = no budget)
+        """
+
+        if cost not in cost_classes:
+            raise ValueError(f'unknown cost class: {cost}')
+        self.name = name
+        self.handler = handler
+        self.arity = arity
+        self.optional = optional
+        self.parser = parser
+        self.cost = cost
+        self.label = label or name
+        self.budget = budget
+
+    def __call__(self, *operands):
+        """
+        Parses the required operands and runs the handler, optional
+        operands are passed through unparsed and any past those dropped
+
+        :param operands: operands
+        :returns: handler result
+        """
+
+        if len(operands) < self.arity:
+            raise ValueError(f'{self.name} takes {self.arity} operand(s), got {len(operands)}')
+        operands = list(operands[:self.arity + self.optional])
+        if self.parser is not None:
+            operands[:self.arity] = [self.parser(op) for op in operands[:self.arity]]
+        return self.handler(*operands)
+
+    def __repr__(self):
+        return f'Operation({self.name!r}, arity={self.arity}, cost={self.cost!r})'
+
+
+class Registry:
+    """Named operations, in registration order"""
+
+    def __init__(self):
+        self.operations = {}
+        self.labels = {}
+
+    def register(self, name, handler=None, **options):
+        """
+        Registers an operation, usable as a decorator when handler is left out
+
+        :param name: operation name
+        :param handler: function doing the operation
+        :param options: Operation options (arity, optional, parser, cost, label, budget)
+        :returns: handler
+        """
+
+        if handler is None:
+            return lambda func: self.register(name, func, **options)
+
+        op = Operation(name, handler, **options)
+        self.operations[name] = op
+        self.labels[op.label] = op
+        return handler
+
+    def get(self, name):
+        """
+        :param name: operation name
+        :returns: Operation
+        """
+
+        try:
+            return self.operations[name]
+        except KeyError:
+            raise ValueError(f'unknown operation: {name}') from None
+
+    def by_label(self, label):
+        """
+        :param label: display name
+        :returns: Operation, or None if no operation has that label
+        """
+
+        return self.labels.get(label)
+
+    def call(self, name, *operands):
+        """
+        Runs an operation by name
+
+        :param name: operation name
+        :param operands: operands
+        :returns: operation result
+        """
+
+        return self.get(name)(*operands)
+
+    def cost(self, name):
+        """
+        :param name: operation name
+        :returns: cost class
+        """
+
+        return self.get(name).cost
+
+    def names(self):
+        """
+        :returns: operation names, in registration order
+        """
+
+        return list(self.operations)
+
+    def __contains__(self, name):
+        return name in self.operations
+
+    def __iter__(self):
+        return iter(self.operations.values())
+
+    def __len__(self):
+        return len(self.operations)
+
+
+# Test:
+if __name__ == '__main__':
+    ops = Registry()
+    ops.register('add', lambda a, b: a + b, arity=2, parser=float)
+    print(ops.call('add', '1.5', '2'), ops.get('add'))
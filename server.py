@@ -0,0 +1,363 @@
+"""
+File: server.py
+Description:
+    Headless HTTP/JSON calculation service, so the calculator can run as
+    several instances behind a load balancer without the gui. Calculations
+    run on the shared worker process pool (executor.py), requests past the
+    queue limit are turned away with 503 and connections are kept alive
+    between requests (HTTP/1.1).
+
+    Parsing evaluates python, so request expressions are checked to only
+    hold math (tokenizer.check_input) and file operands aren't accepted.
+    Still, listen on loopback (the default) or a private network behind
+    the load balancer only, the service must not be exposed publicly.
+
+    Every request gets --timeout seconds (default 30) and is answered with
+    504 past that. The time limit is also the budget of each operation type
+    (timeouts.py) and a worker still stuck on a request is replaced.
+
+    POST /calculate  {"expr": "d/dx[x^2]", "conditions": ["x", "", "", "", "", ""]}
+    POST /vector     {"oper": "cross", "a": "[1, 0, 0]", "b": "[0, 1, 0]"}
+    POST /graph      {"expr": "sin(x)", "x_min": -10, "x_max": 10, "dpi": 100}  -> image/png
+    POST /generate   {"problem": "what is 2 plus 2"}
+    GET  /health
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8000] [-j WORKERS] [--queue 64] [--keep-alive 15]
+                     [--timeout 30]
+"""
+
+import argparse
+import json
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import executor
+import graph
+import timeouts
+from lazy import lazy_import
+from tokenizer import check_input
+from vector import is_file_operand, operations as vector_operations
+
+# Only needed by /generate (pulls in dotenv / openai)
+solver_ai = lazy_import('solver_ai')
+
+
+# Largest request body accepted (bytes)
+max_body = 1 << 20
+
+# Graph limits: dots per inch, and largest |x| of the x-range
+dpi_range = (10, 300)
+max_x = 1e6
+
+# Seconds a request may take before it's answered with 504 (set by --timeout)
+time_limit = 30
+
+# Seconds past time_limit before a worker still on the request counts as stuck
+# (budgets don't count the budgeted child's start-up)
+grace = 5
+
+
+class Admission:
+    """Caps requests being calculated or waiting for a worker"""
+
+    def __init__(self, limit):
+        """
+        :param limit: most requests in flight at once
+        """
+
+        self.limit = limit
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        :returns: whether the request was admitted (release() once done)
+        """
+
+        with self._lock:
+            if self.pending >= self.limit:
+                return False
+            self.pending += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.pending -= 1
+
+
+def to_json(result):
+    """
+    :param result: calculation result
+    :returns: json serializable result (None, str, or str of anything else as in the gui)
+    """
+
+    if result is None or isinstance(result, str):
+        return result
+    return str(result)
+
+def expression(value, field):
+    """
+    :param value: request json value
+    :param field: field name, for errors
+    :returns: value as text, checked to only hold math
+    :raises ValueError: if the value isn't a math expression
+    """
+
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        raise ValueError(f'{field} must be a string')
+    return check_input(str(value))
+
+def operand(body, field):
+    """
+    :param body: request json
+    :param field: 'a' or 'b' (b optional)
+    :returns: operand text, or None for a missing b
+    :raises ValueError: if the operand names a file or isn't a math expression
+    """
+
+    if field == 'b' and body.get('b') is None:
+        return None
+    text = expression(body[field], field)
+    if is_file_operand(text):
+        raise ValueError('file operands are not accepted over HTTP')
+    return text
+
+def number(body, field, default, low, high):
+    """
+    :param body: request json
+    :param field: field name
+    :param default: value if the field is missing
+    :param low: smallest value allowed
+    :param high: largest value allowed
+    :returns: float within low and high
+    :raises ValueError: if the field isn't such a number
+    """
+
+    value = float(body.get(field, default))
+    if not low <= value <= high:  # Also false for nan
+        raise ValueError(f'{field} must be between {low:g} and {high:g}')
+    return value
+
+def wait(future):
+    """
+    :param future: future of a calculation on the worker pool
+    :returns: calculation result
+    :raises TimeoutError: if the calculation ran out of time
+    """
+
+    try:
+        result = future.result(timeout=time_limit + grace)
+    except TimeoutError:
+        if not future.cancel():
+            # Running, only killing the worker stops it
+            executor.replace_pool()
+        raise TimeoutError(f'calculation took longer than {time_limit:g}s') from None
+    if isinstance(result, timeouts.CalcTimeout):
+        raise TimeoutError(f'calculation took longer than {result.seconds:g}s')
+    return result
+
+def calculate(body):
+    """
+    :param body: request json, expr and optional conditions
+    :returns: response json
+    """
+
+    # First six conditions only, budgets are the server's (--timeout, CALC_TIMEOUT_<TYPE>)
+    conditions = body.get('conditions') or []
+    if not isinstance(conditions, list):
+        raise ValueError('conditions must be a list')
+    conditions = conditions[:6]
+    conditions += [''] * (6 - len(conditions))
+    conditions = [expression(c, 'conditions') for c in conditions]
+    result = wait(executor.submit_calculate(expression(body['expr'], 'expr'), conditions))
+    return {'result': to_json(result)}
+
+def vector(body):
+    """
+    :param body: request json, oper, a and optional b
+    :returns: response json
+    """
+
+    oper = body['oper']
+    if not isinstance(oper, str):
+        raise ValueError('oper must be a string')
+    if vector_operations.get(oper).arity == 2 and body.get('b') is None:
+        raise KeyError('b')
+    result = wait(executor.submit_vector_calc(oper, operand(body, 'a'), operand(body, 'b')))
+    return {'result': to_json(result)}
+
+def render(body):
+    """
+    :param body: request json, expr and optional x_min, x_max, dpi
+    :returns: PNG bytes
+    """
+
+    x_min = number(body, 'x_min', -10, -max_x, max_x)
+    x_max = number(body, 'x_max', 10, -max_x, max_x)
+    if x_min >= x_max:
+        raise ValueError('x_min must be less than x_max')
+    dpi = int(number(body, 'dpi', 100, *dpi_range))
+    return wait(executor.get_pool().submit(graph.render_png, expression(body['expr'], 'expr'), x_min, x_max,
+                                           (6.4, 4.8), dpi))
+
+def generate(body):
+    """
+    :param body: request json, problem
+    :returns: response json
+    """
+
+    # Waits on the network, not the cpu, so it runs on the request thread
+    # (local answers are within CALC_AI_LOCAL_BUDGET)
+    problem = body['problem']
+    if not isinstance(problem, str):
+        raise ValueError('problem must be a string')
+    return {'answer': solver_ai.generate(problem, timeout=time_limit)}
+
+# Path -> (handler, response content type)
+routes = {
+    '/calculate': (calculate, 'application/json'),
+    '/vector': (vector, 'application/json'),
+    '/graph': (render, 'image/png'),
+    '/generate': (generate, 'application/json'),
+}
+
+
+class CalcHandler(BaseHTTPRequestHandler):
+    """Request handler, one thread per connection"""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+    server_version = 'CalCulator'
+    timeout = 15  # Seconds an idle kept-alive connection is held open
+
+    def send(self, status, payload, content_type='application/json'):
+        """
+        :param status: HTTP status code
+        :param payload: bytes, or json serializable object
+        :param content_type: content type of bytes payloads
+        """
+
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        if status == 503:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send(200, {'status': 'ok', 'pending': self.server.admission.pending,
+                            'limit': self.server.admission.limit})
+        else:
+            self.send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > max_body:
+            self.close_connection = True  # Body left unread
+            self.send(413, {'error': 'request body too large'})
+            return
+        raw = self.rfile.read(length)
+
+        if self.path not in routes:
+            self.send(404, {'error': 'not found'})
+            return
+        try:
+            body = json.loads(raw or b'{}')
+            if not isinstance(body, dict):
+                raise ValueError('expected a json object')
+        except ValueError as e:
+            self.send(400, {'error': f'invalid json: {e}'})
+            return
+
+        if not self.server.admission.acquire():
+            self.send(503, {'error': 'server busy'})
+            return
+        handler, content_type = routes[self.path]
+        try:
+            self.send(200, handler(body), content_type)
+        except KeyError as e:
+            self.send(400, {'error': f'missing field: {e.args[0]}'})
+        except ValueError as e:
+            self.send(400, {'error': str(e)})
+        except TimeoutError as e:
+            self.send(504, {'error': str(e) or 'timed out'})
+        except BrokenProcessPool:
+            # Caught in a stuck worker's replacement
+            self.send(503, {'error': 'worker restarted, retry'})
+        except Exception as e:
+            self.send(500, {'error': repr(e)})
+        finally:
+            self.server.admission.release()
+
+    def log_message(self, format, *args):
+        # Access log off, the load balancer keeps one
+        pass
+
+
+def set_time_limit(seconds):
+    """
+    Sets the request time limit, also capping every operation type's budget
+
+    :param seconds: time limit in seconds
+    """
+
+    global time_limit
+    time_limit = seconds
+    for op, budget in timeouts.budgets.items():
+        timeouts.budgets[op] = min(budget or seconds, seconds)
+
+def make_server(host='127.0.0.1', port=8000, queue=64, keep_alive=15):
+    """
+    :param host: interface to listen on
+    :param port: port (0 picks a free one)
+    :param queue: most requests calculating or waiting for a worker
+    :param keep_alive: seconds an idle connection is kept open
+    :returns: ThreadingHTTPServer, run with serve_forever()
+    """
+
+    handler = type('Handler', (CalcHandler,), {'timeout': keep_alive})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.admission = Admission(queue)
+    return server
+
+def main(argv=None):
+    """Command line entry point"""
+
+    parser = argparse.ArgumentParser(description='Serve calculations over HTTP/JSON')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='interface to listen on (loopback by default, never expose the service publicly)')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('-j', '--workers', type=int,
+                        help='worker processes (default: CALC_WORKERS / every core)')
+    parser.add_argument('--queue', type=int, default=64,
+                        help='requests calculating or waiting before 503 is returned')
+    parser.add_argument('--keep-alive', type=float, default=15,
+                        help='seconds an idle connection is kept open')
+    parser.add_argument('--timeout', type=float, default=time_limit,
+                        help='seconds a request may take before 504 is returned')
+    args = parser.parse_args(argv)
+    if args.timeout <= 0:
+        parser.error('--timeout must be positive')
+
+    set_time_limit(args.timeout)
+    executor.get_pool(args.workers)  # Start workers (inheriting the budgets) before the first request
+    server = make_server(args.host, args.port, args.queue, args.keep_alive)
+    print(f'serving on http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        executor.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,42 +3,603 @@ File: solver_ai.py
 Description:
     Implements an ai solver using the OpenAI API for
     the word problem page in main.py.
+
+    Requests go through an asyncio solver with bounded concurrency, retries
+    with exponential backoff and a content-hash keyed response cache. The
+    backend is pluggable: HTTPBackend talks the chat completions protocol
+    over pooled keep-alive connections (point OPENAI_BASE_URL at a local
+    stand-in server for testing), OpenAIBackend uses the openai package.
 """
 
+import asyncio
+import hashlib
+import http.client
+import json
 import os
+import queue
+import random
+import re
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from urllib.parse import urlsplit
+
+import sympy as smp
 from dotenv import load_dotenv
-import openai
+
+from cache import ExpressionCache
+from calculator import calculate, clean, post_clean
+from expr_store import parse
+from timeouts import budget_for, run_with_timeout
 
 
 # Set API key
 load_dotenv('.env')
-openai.api_key = os.getenv('OPENAI_API_KEY')
+api_key = os.getenv('OPENAI_API_KEY')
+model = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+
+
+class RetryableError(Exception):
+    """Backend failure worth retrying (rate limit, server error, dropped connection)"""
+
+
+# ---------------- Backends ----------------
+
+class HTTPBackend:
+    """Chat completions over a pool of keep-alive HTTP connections"""
+
+    def __init__(self, base_url=None, key=None, pool_size=8, timeout=60):
+        """
+        :param base_url: api root (defaults to OPENAI_BASE_URL or OpenAI)
+        :param key: api key
+        :param pool_size: max open connections
+        :param timeout: socket timeout in seconds
+        """
+
+        url = urlsplit(base_url or os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1'))
+        self.https = url.scheme == 'https'
+        self.host = url.netloc
+        self.path = url.path.rstrip('/') + '/chat/completions'
+        self.key = key if key is not None else api_key
+        self.timeout = timeout
+        self._pool = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _connect(self):
+        """
+        :returns: new HTTP(S) connection
+        """
+
+        if self.https:
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def _post(self, body, read=None):
+        """
+        Sends a request on a pooled connection (blocking)
+
+        :param body: json request body
+        :param read: optional function consuming a successful response as it
+                     arrives (for streaming), otherwise the body is decoded
+        :returns: decoded json response (None if read given)
+        """
+
+        headers = {'Content-Type': 'application/json'}
+        if self.key:
+            headers['Authorization'] = f'Bearer {self.key}'
+
+        with self._slots:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                conn.request('POST', self.path, body=json.dumps(body), headers=headers)
+                response = conn.getresponse()
+                if read is None or response.status >= 400:
+                    data = response.read()
+                else:
+                    read(response)
+                    data = response.read()  # Drain so the connection can be reused
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise RetryableError(repr(e)) from e
+            except Exception:
+                conn.close()
+                raise
+            self._pool.put(conn)
+
+        if response.status == 429 or response.status >= 500:
+            raise RetryableError(f'HTTP {response.status}')
+        if response.status >= 400:
+            raise RuntimeError(f'HTTP {response.status}: {data[:200]!r}')
+        return None if read is not None else json.loads(data)
+
+    async def complete(self, messages):
+        """
+        :param messages: chat messages
+        :returns: answer text
+        """
+
+        data = await asyncio.to_thread(self._post, {'model': model, 'messages': messages})
+        return data['choices'][0]['message']['content']
+
+    async def stream(self, messages):
+        """
+        Streams an answer as server-sent events
+
+        :param messages: chat messages
+        :returns: async iterator of answer text chunks
+        """
+
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        finished = object()
+
+        def read(response):
+            # Runs on a worker thread, hands chunks to the event loop
+            for raw in response:
+                line = raw.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                payload = line[len('data:'):].strip()
+                if payload == '[DONE]':
+                    break
+                text = json.loads(payload)['choices'][0].get('delta', {}).get('content')
+                if text:
+                    loop.call_soon_threadsafe(chunks.put_nowait, text)
+
+        body = {'model': model, 'messages': messages, 'stream': True}
+        request = loop.run_in_executor(None, self._post, body, read)
+        request.add_done_callback(lambda _: chunks.put_nowait(finished))
+        while True:
+            text = await chunks.get()
+            if text is finished:
+                break
+            yield text
+        await request  # Raise request errors
+
+    def close(self):
+        """Closes pooled connections"""
+
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class OpenAIBackend:
+    """Chat completions through the openai package"""
+
+    async def complete(self, messages):
+        """
+        :param messages: chat messages
+        :returns: answer text
+        """
+
+        import openai
+        openai.api_key = api_key
+        try:
+            response = await openai.ChatCompletion.acreate(model=model, messages=messages)
+        except (openai.error.RateLimitError, openai.error.APIConnectionError,
+                openai.error.ServiceUnavailableError, openai.error.Timeout) as e:
+            raise RetryableError(repr(e)) from e
+        return response.choices[0].message.content
+
+    async def stream(self, messages):
+        """
+        :param messages: chat messages
+        :returns: async iterator of answer text chunks
+        """
+
+        import openai
+        openai.api_key = api_key
+        try:
+            response = await openai.ChatCompletion.acreate(model=model, messages=messages, stream=True)
+            async for chunk in response:
+                text = chunk.choices[0].delta.get('content')
+                if text:
+                    yield text
+        except (openai.error.RateLimitError, openai.error.APIConnectionError,
+                openai.error.ServiceUnavailableError, openai.error.Timeout) as e:
+            raise RetryableError(repr(e)) from e
+
+
+# ---------------- Local pre-solver ----------------
+
+# Leading question phrases and number words stripped / translated before matching
+question_prefix = re.compile(r"^(what is|what's|whats|calculate|compute|evaluate|simplify|find|"
+                             r"solve(\s+for\s+[xyz])?)\s*:?\s*")
+word_operators = [(' plus ', '+'), (' minus ', '-'), (' times ', '*'), (' multiplied by ', '*'),
+                  (' divided by ', '/'), (' over ', '/'), (' to the power of ', '^')]
+math_only = re.compile(r'[\d\s.+\-*/^()=xyz]+')
+
+# Seconds an expression / equation gets before it's left to the model (ex. '9^9^9')
+local_budget = os.getenv('CALC_AI_LOCAL_BUDGET', '5')
+
+# Comparison word problems, the whole text: 'tom has 5 apples. sue has 3 apples.
+# how many more apples does tom have (than sue)'. Only this structure is answered locally,
+# anything else ('3 boxes with 12 apples each ... in total', '... to have twice as many')
+# is left to the model
+comparison = re.compile(r'(\w+) (?:has|had) (\d+(?:\.\d+)?) (\w+)[.,;] (?:and )?'
+                        r'(\w+) (?:has|had) (\d+(?:\.\d+)?) (\w+)[.,;] '
+                        r'how (?:many|much) (more|fewer|less) (\w+) (?:does|did) (\w+) (?:have|has)'
+                        r'(?: than (\w+))?')
+
+def solve_equation(text):
+    """
+    Solves a single variable equation
+
+    :param text: equation, ex. '2x + 3 = 11'
+    :returns: answer string or None
+    """
+
+    sides = text.split('=')
+    if len(sides) != 2:
+        return None
+    expr = parse(clean(sides[0].replace(' ', ''))) - parse(clean(sides[1].replace(' ', '')))
+    symbols = list(expr.free_symbols)
+    if len(symbols) != 1:
+        return None
+    solutions = smp.solve(expr, symbols[0])
+    if not solutions or not all(sol.is_finite for sol in solutions):
+        return None
+    values = ', '.join(post_clean(str(sol)) for sol in solutions)
+    return f'{symbols[0]} = {values}'
+
+def is_number(result):
+    """
+    :param result: calculate result
+    :returns: whether result is a finite number (not zoo / nan / symbolic / a timeout)
+    """
+
+    if not isinstance(result, str) or result in ('None', 'ERROR'):
+        return False
+    try:
+        value = parse(clean(result))
+    except Exception:
+        return False
+    return bool(value.is_number and value.is_finite)
+
+def compare(match):
+    """
+    Answers a matched comparison word problem
+
+    :param match: comparison match
+    :returns: answer, or None if the question doesn't fit the quantities
+    """
+
+    name_a, count_a, thing_a, name_b, count_b, thing_b, word, thing, subject, other = match.groups()
+    counts = {name_a: float(count_a), name_b: float(count_b)}
+    if len(counts) != 2 or thing_a != thing_b or thing != thing_a or subject not in counts:
+        return None
+    if other is None:
+        other = name_b if subject == name_a else name_a
+    if other == subject or other not in counts:
+        return None
+    difference = counts[subject] - counts[other]
+    if word != 'more':
+        difference = -difference
+    if difference <= 0:
+        return None
+    return f'The answer is {difference:g}.'
+
+def local_solve(problem):
+    """
+    Tries answering a problem locally with sympy, without the remote model
+
+    :param problem: string of problem
+    :returns: (answer, confidence from 0 to 1), or (None, 0)
+    """
+
+    text = ' ' + problem.strip().lower().rstrip('?.!') + ' '
+    for words, op in word_operators:
+        text = text.replace(words, f' {op} ')
+    text = question_prefix.sub('', text.strip()).strip()
+
+    try:
+        # Whole problem is an expression or equation
+        if text and math_only.fullmatch(text) and any(c.isdigit() for c in text):
+            if '=' in text:
+                seconds = budget_for('regular', ['', '', '', '', '', '', local_budget])
+                if seconds is not None:
+                    answer = run_with_timeout('regular', seconds, solve_equation, text)
+                else:
+                    answer = solve_equation(text)
+                return (answer, 0.95) if isinstance(answer, str) else (None, 0)
+            # Only finite numbers that are an actual answer (not '3x = 3x', '5/0 = zoo')
+            result = calculate(text, ['', '', '', '', '', '', local_budget])
+            if is_number(result) and result != text.replace(' ', ''):
+                return f'{text.replace(" ", "")} = {result}', 0.95
+            return None, 0
+
+        # Two quantities of the same thing compared, the text being nothing else
+        match = comparison.fullmatch(text)
+        answer = compare(match) if match else None
+        if answer is not None:
+            return answer, 0.85
+    except Exception:
+        pass
+    return None, 0
+
+
+# ---------------- Solver ----------------
+
+class AsyncSolver:
+    """Solves problems concurrently through a backend, caching answers"""
+
+    def __init__(self, backend=None, concurrency=4, retries=4, backoff=0.5, cache_dir=None,
+                 local_threshold=0.8, memory_size=256):
+        """
+        :param backend: object with `async complete(messages)` (defaults to HTTPBackend)
+        :param concurrency: max requests in flight
+        :param retries: retries after a retryable failure
+        :param backoff: first retry delay in seconds (doubles each retry)
+        :param cache_dir: directory answers are cached in (None = memory only)
+        :param local_threshold: min confidence for a local sympy answer (None = always remote)
+        :param memory_size: answers kept in memory (least recently used dropped first)
+        """
+
+        self.backend = backend or HTTPBackend(pool_size=concurrency)
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.cache_dir = cache_dir
+        self.local_threshold = local_threshold
+        self.routed = Counter()  # Requests served 'local', from 'cache' or 'remote'
+        self.memory = ExpressionCache(maxsize=memory_size)
+        self.latencies = deque(maxlen=100)  # Recent streaming timings
+        self._semaphores = weakref.WeakKeyDictionary()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(messages):
+        """
+        :param messages: chat messages
+        :returns: content hash of model + messages
+        """
+
+        content = json.dumps([model, messages], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def cached(self, key):
+        """
+        :param key: content hash
+        :returns: cached answer or None
+        """
+
+        answer = self.memory.get(key)
+        if answer is not None:
+            return answer
+        if self.cache_dir is None:
+            return None
+        path = os.path.join(self.cache_dir, key + '.json')
+        try:
+            with open(path, encoding='utf-8') as f:
+                answer = json.load(f)['answer']
+        except (OSError, ValueError, KeyError):
+            return None
+        if not answer:
+            # Empty answers aren't answers, ask again
+            return None
+        self.memory.put(key, answer)
+        return answer
+
+    def store(self, key, answer):
+        """
+        :param key: content hash
+        :param answer: answer text (empty answers aren't stored)
+        """
+
+        if not answer:
+            return
+        self.memory.put(key, answer)
+        if self.cache_dir is None:
+            return
+        path = os.path.join(self.cache_dir, key + '.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'answer': answer}, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def semaphore(self):
+        """
+        :returns: concurrency limit for the running event loop
+        """
+
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[loop]
+
+    async def solve(self, problem):
+        """
+        Generates a response from chat AI based on user input problem
+
+        :param problem: string of problem
+        :returns: generated response
+        """
+
+        answer = self.try_local(problem)
+        if answer is not None:
+            return answer
+
+        messages = build_messages(problem)
+        key = self.make_key(messages)
+        answer = self.cached(key)
+        if answer is not None:
+            self.routed['cache'] += 1
+            return answer
+
+        self.routed['remote'] += 1
+        async with self.semaphore():
+            for attempt in range(self.retries + 1):
+                try:
+                    answer = await self.backend.complete(messages)
+                    break
+                except RetryableError:
+                    if attempt == self.retries:
+                        raise
+                    # Exponential backoff with jitter
+                    await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+        self.store(key, answer)
+        return answer
+
+    async def stream(self, problem):
+        """
+        Streams a response from chat AI, chunk by chunk, recording
+        time to first chunk and total latency (see latency_stats)
+
+        :param problem: string of problem
+        :returns: async iterator of response text chunks
+        """
 
-def generate(problem):
+        start = time.perf_counter()
+        answer = self.try_local(problem)
+        if answer is not None:
+            self.record_latency(start, start, source='local')
+            yield answer
+            return
+
+        messages = build_messages(problem)
+        key = self.make_key(messages)
+        answer = self.cached(key)
+        if answer is not None:
+            self.routed['cache'] += 1
+            self.record_latency(start, start, source='cache')
+            yield answer
+            return
+
+        self.routed['remote'] += 1
+        chunks = []
+        first = None
+        async with self.semaphore():
+            for attempt in range(self.retries + 1):
+                try:
+                    async for text in self.backend.stream(messages):
+                        if first is None:
+                            first = time.perf_counter()
+                        chunks.append(text)
+                        yield text
+                    break
+                except RetryableError:
+                    # Can't take back chunks already shown, only retry before the first
+                    if attempt == self.retries or chunks:
+                        raise
+                    await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+        self.record_latency(start, first)
+        self.store(key, ''.join(chunks))
+
+    def try_local(self, problem):
+        """
+        Answers a problem locally if the pre-solver is confident enough
+
+        :param problem: string of problem
+        :returns: answer or None
+        """
+
+        if self.local_threshold is None:
+            return None
+        answer, confidence = local_solve(problem)
+        if answer is None or confidence < self.local_threshold:
+            return None
+        self.routed['local'] += 1
+        return answer
+
+    def record_latency(self, start, first, source='remote'):
+        """
+        :param start: perf_counter at request start
+        :param first: perf_counter at first chunk (None if no chunks)
+        :param source: 'remote', 'cache' or 'local'
+        """
+
+        end = time.perf_counter()
+        self.latencies.append({'first_chunk': (first or end) - start,
+                               'total': end - start, 'source': source})
+
+    def latency_stats(self):
+        """
+        :returns: dict of count, mean / max time to first chunk and
+                  mean / max total latency (seconds) over recent streams
+        """
+
+        if not self.latencies:
+            return {'count': 0}
+        firsts = [lat['first_chunk'] for lat in self.latencies]
+        totals = [lat['total'] for lat in self.latencies]
+        return {'count': len(self.latencies),
+                'first_chunk_mean': sum(firsts) / len(firsts), 'first_chunk_max': max(firsts),
+                'total_mean': sum(totals) / len(totals), 'total_max': max(totals)}
+
+    async def solve_many(self, problems):
+        """
+        :param problems: list of problem strings
+        :returns: list of responses, in input order
+        """
+
+        # Identical problems share one request
+        unique = list(dict.fromkeys(problems))
+        answers = dict(zip(unique, await asyncio.gather(*(self.solve(p) for p in unique))))
+        return [answers[p] for p in problems]
+
+
+def build_messages(problem):
+    """
+    :param problem: string of problem
+    :returns: chat messages for the problem
+    """
+
+    prompt = f'Solve the following problem: {problem}. Make sure your answer is easily readable'
+    return [{'role': 'user', 'content': prompt}]
+
+# Shared solver (CALC_AI_BACKEND=openai uses the openai package, CALC_AI_CACHE caches to disk)
+# (CALC_AI_LOCAL_THRESHOLD sets pre-solver confidence needed, 'off' disables it)
+threshold = os.getenv('CALC_AI_LOCAL_THRESHOLD', '0.8')
+solver = AsyncSolver(backend=OpenAIBackend() if os.getenv('CALC_AI_BACKEND') == 'openai' else None,
+                     cache_dir=os.getenv('CALC_AI_CACHE'),
+                     local_threshold=None if threshold == 'off' else float(threshold))
+
+def generate(problem, timeout=None):
     """
     Generates a response from chat AI based on user input problem
 
     :param problem: string of problem
+    :param timeout: seconds to wait for the answer (None = no limit)
     :returns: generated response
+    :raises TimeoutError: if no answer within timeout
     """
 
-    prompt = f'Solve the following problem: {problem}. Make sure your answer is easily readable'
+    return asyncio.run(asyncio.wait_for(solver.solve(problem), timeout))
+
+def generate_stream(problem):
+    """
+    Generates a response from chat AI chunk by chunk (blocking
+    generator, for use from a worker thread)
+
+    :param problem: string of problem
+    :returns: generator of response text chunks
+    """
 
-    # Generate response to prompt
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages = [
-            {'role': 'user', 
-            'content': prompt }
-        ]
-    )
-    
-    answer = response.choices[0].message.content
-    return answer
+    loop = asyncio.new_event_loop()
+    chunks = solver.stream(problem)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(chunks.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(chunks.aclose())
+        loop.close()
 
 
 # Test:
 if __name__ == '__main__':
     prob = 'Jared has 10 donuts and Michael has 24 donuts. How many more donuts does Michael have than Jared?'
     ans = generate(prob)
-    print(ans)
\ No newline at end of file
+    print(ans)
@@ -0,0 +1,59 @@
+import io
+import json
+
+import pytest
+
+import batch
+import calculator
+from calculator import calculate_many
+
+
+wrt_x = ['x', '', '', '', '', '']
+
+
+def test_calculate_many_keeps_order():
+    assert calculate_many(['d/dx[x^3]', '2+3', 'd/dx[x^2]'], wrt_x) == ['3x^2', '5', '2x']
+
+
+def test_calculate_many_evaluates_duplicates_once(monkeypatch):
+    calculator.result_cache.clear()
+    calls = []
+    evaluate = calculator.evaluate
+    monkeypatch.setattr(calculator, 'evaluate', lambda *args: calls.append(args[0]) or evaluate(*args))
+    assert calculate_many(['d/dx[x^4]', 'd/dx[x ^ 4]', 'd/dx[x^4]'], wrt_x) == ['4x^3'] * 3
+    assert len(calls) == 1
+
+
+def test_calculate_many_per_expression_conditions():
+    results = calculate_many(['∂/∂x[x^2y]', '∂/∂x[x^2y]'], [wrt_x, ['y', '', '', '', '', '']])
+    assert results == ['2xy', 'x^2']
+    with pytest.raises(ValueError):
+        calculate_many(['2+3'], [wrt_x, wrt_x])
+
+
+def test_read_jsonl():
+    f = io.StringIO('{"expr": "d/dx[x^2]", "conditions": ["x"]}\n\n"2+3"\n')
+    assert list(batch.read_jsonl(f)) == [('d/dx[x^2]', wrt_x), ('2+3', [''] * 6)]
+
+
+def test_read_csv():
+    f = io.StringIO('expr,wrt,lower,upper\n∫[x],x,0,1\n2+3,,,\n')
+    assert list(batch.read_csv(f)) == [('∫[x]', ['x', '', '0', '1', '', '', '']),
+                                       ('2+3', [''] * 7)]
+
+
+def test_run_writes_json_lines():
+    out = io.StringIO()
+    problems = [('d/dx[x^2]', wrt_x), ('2+3', [''] * 6), ('1/2', [''] * 6)]
+    assert batch.run(problems, out, chunk_size=2) == 3
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert lines == [{'expr': 'd/dx[x^2]', 'result': '2x'}, {'expr': '2+3', 'result': '5'},
+                     {'expr': '1/2', 'result': '0.5'}]
+
+
+def test_main_reads_csv_file(tmp_path):
+    problems = tmp_path / 'problems.csv'
+    problems.write_text('expr,wrt\nd/dx[x^5],x\n', encoding='utf-8')
+    results = tmp_path / 'results.jsonl'
+    batch.main([str(problems), '-o', str(results)])
+    assert json.loads(results.read_text(encoding='utf-8')) == {'expr': 'd/dx[x^5]', 'result': '5x^4'}
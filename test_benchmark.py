@@ -0,0 +1,19 @@
+import pytest
+
+import benchmark
+import calculator
+
+
+def test_limit_and_series_benchmarked():
+    assert {'limit', 'series'} <= set(benchmark.calc_workloads)
+
+
+@pytest.mark.parametrize('name', list(benchmark.calc_workloads))
+def test_calc_workload_answers(name):
+    expr, conditions = benchmark.calc_workloads[name]
+    assert calculator.evaluate(expr, conditions) not in (None, 'None', 'ERROR')
+
+
+def test_bench_calculate():
+    times = benchmark.bench_calculate(repeat=1)
+    assert set(times) == set(benchmark.calc_workloads)
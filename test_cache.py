@@ -0,0 +1,40 @@
+from cache import ExpressionCache
+
+
+def test_key_ignores_spaces():
+    assert ExpressionCache.make_key('x ^ 2', ['x', ' ']) == ExpressionCache.make_key('x^2', ['x', ''])
+
+
+def test_least_recently_used_evicted():
+    cache = ExpressionCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')  # b is now the oldest
+    cache.put('c', 3)
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert len(cache) == 2
+
+
+def test_hits_and_misses():
+    cache = ExpressionCache()
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    assert cache.get('b', 'missing') == 'missing'
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 512}
+
+
+def test_persisted_to_json(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = ExpressionCache(path=path)
+    cache.put(ExpressionCache.make_key('x^2', ['x']), '2x')
+    cache.save()
+
+    loaded = ExpressionCache(path=path)
+    assert loaded.get(ExpressionCache.make_key('x^2', ['x'])) == '2x'
+
+
+def test_corrupt_file_starts_cold(tmp_path):
+    path = tmp_path / 'cache.json'
+    path.write_text('{not json')
+    assert len(ExpressionCache(path=str(path))) == 0
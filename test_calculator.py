@@ -0,0 +1,55 @@
+import pytest
+
+from calculator import calculate
+
+
+none = ['', '', '', '', '', '']
+wrt_x = ['x', '', '', '', '', '']
+
+
+@pytest.mark.parametrize('expr, result', [
+    ('6x+2x', '8x'),
+    ('3x*2', '6x'),
+    ('2^3', '8'),
+    ('e^0', '1'),
+    ('ln(e)', '1'),
+    ('sec(0)', '1'),
+    ('arcsin(1)', 'π/2'),
+])
+def test_regular(expr, result):
+    assert calculate(expr, none) == result
+
+
+@pytest.mark.parametrize('expr, result', [
+    ('d/dx[x^2]', '2x'),
+    ('d/dx[sec(x)]', 'tan(x)sec(x)'),
+    ('d/dx[e^x]', 'e^x'),
+    ('∂/∂x[x^2y]', '2xy'),
+    ('∫[2x]', 'x^2'),
+    ('∫[x e^x]', '(x - 1)e^x'),
+])
+def test_operations(expr, result):
+    assert calculate(expr, wrt_x) == result
+
+
+def test_definite_integral():
+    assert calculate('∫[x]', ['x', '', '0', '1', '', '']) == '1/2'
+
+
+@pytest.mark.parametrize('expr, toward, result', [
+    ('lim[sin(x)/x]', '0', '1'),
+    ('lim[(1+1/x)^x]', 'oo', 'e'),
+    ('lim[1/x]', '0+', 'oo'),
+    ('lim[1/x]', '0-', '-oo'),
+])
+def test_limit(expr, toward, result):
+    assert calculate(expr, ['x', toward, '', '', '', '']) == result
+
+
+@pytest.mark.parametrize('expr, bounds, result', [
+    ('Σ[1/n^2]', ['', ''], 'π^2/6'),
+    ('Σ[i]', ['1', '10'], '55'),
+    ('Σ[1/2^n]', ['0', 'oo'], '2'),
+])
+def test_series(expr, bounds, result):
+    assert calculate(expr, ['', '', '', ''] + bounds) == result
@@ -0,0 +1,39 @@
+import pytest
+
+import executor
+from calculator import calculate_many
+
+
+wrt_x = ['x', '', '', '', '', '']
+
+
+@pytest.fixture(autouse=True)
+def pool():
+    yield
+    executor.shutdown()
+
+
+def test_map_calculate_keeps_order():
+    results = executor.map_calculate(['∫[x^2]', 'd/dx[x^3]', '2+3'], [wrt_x] * 3, max_workers=2)
+    assert results == ['x^3/3', '3x^2', '5']
+
+
+def test_calculate_many_with_workers():
+    assert calculate_many(['d/dx[x^6]', 'd/dx[x^6]', '∫[2x]'], wrt_x, workers=2) == ['6x^5', '6x^5', 'x^2']
+
+
+def test_submit_calculate():
+    assert executor.submit_calculate('d/dx[x^2]', wrt_x).result(timeout=60) == '2x'
+
+
+def test_cheap_vector_calc_runs_inline():
+    future = executor.submit_vector_calc('cross', '[1, 0, 0]', '[0, 1, 0]')
+    assert future.done()
+    assert future.result().tolist() == [0, 0, 1]
+    assert executor.pool_size() == 0
+
+
+def test_vector_calc_errors_in_future():
+    future = executor.submit_vector_calc('dot', '[1, 2]', '[1, 2, 3]')
+    with pytest.raises(ValueError):
+        future.result()
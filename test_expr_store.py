@@ -0,0 +1,45 @@
+import pytest
+import sympy as smp
+
+from calculator import calculate
+from expr_store import ExpressionStore
+
+
+none = ['', '', '', '', '', '']
+
+
+def test_parsed_once():
+    store = ExpressionStore()
+    tree = store.parse('x**2+sec(x)*e')
+    assert tree == smp.Symbol('x') ** 2 + smp.sec(smp.Symbol('x')) * smp.E
+    assert store.parse('x**2+sec(x)*e') is tree
+
+
+def test_parsed_tree_passed_through():
+    tree = smp.Symbol('x') + 1
+    assert ExpressionStore().parse(tree) is tree
+
+
+def test_spilled_to_sqlite(tmp_path):
+    path = str(tmp_path / 'exprs.sqlite')
+    store = ExpressionStore(path=path)
+    tree = store.parse('sin(x)**2')
+    store.close()
+
+    reopened = ExpressionStore(path=path)
+    key = reopened.make_key('sin(x)**2')
+    assert reopened._spilled(key) == tree
+    reopened.close()
+
+
+@pytest.mark.parametrize('expr, result', [
+    ('10/4', '2.5'),
+    ('1/2', '0.5'),
+    ('3.5*2', '7.0'),
+    ('4/2', '2.0'),
+    ('2+3', '5'),
+    ('x/2', 'x/2'),
+    ('sqrt(16)', '4'),
+])
+def test_number_only_output_unchanged(expr, result):
+    assert calculate(expr, none) == result
@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pytest
+
+import graph
+
+
+def breaks(xs, ys):
+    """x positions of the NaN breaks in a sampled curve"""
+
+    return xs[np.isnan(ys)]
+
+
+@pytest.mark.parametrize('expr', ['sin(x)', 'x^3-2x', 'e^(x/5)'])
+def test_continuous_curve_not_broken(expr):
+    xs, ys = graph.sample(expr)
+    assert np.isfinite(ys).all()
+    assert np.all(np.diff(xs) > 0)
+
+
+def test_poles_broken():
+    xs, ys = graph.sample('tan(x)')
+    poles = [k * math.pi + math.pi / 2 for k in range(-3, 3)]  # Poles in [-10, 10]
+    found = breaks(xs, ys)
+    assert len(found) == len(poles)
+    np.testing.assert_allclose(found, poles, atol=1e-3)
+
+
+def test_step_broken():
+    xs, ys = graph.sample('floor(x)', -2.5, 2.5)
+    np.testing.assert_allclose(breaks(xs, ys), [-2, -1, 0, 1, 2], atol=1e-3)
+
+
+def test_refined_where_curve_bends():
+    xs, ys = graph.sample('sin(1/x)', 0.01, 1)
+    assert len(xs) > 200
+    assert len(xs) <= 20000
+
+
+def test_more_than_one_variable():
+    with pytest.raises(ValueError):
+        graph.sample('x + y')
+
+
+def test_sampled_once():
+    graph.sample_cache.clear()
+    assert graph.sample('x^2') is graph.sample('x ^ 2')
+
+
+def test_render_png():
+    png = graph.render_png('sin(x)', dpi=50)
+    assert png.startswith(b'\x89PNG\r\n\x1a\n')
+
+
+def test_render_array_size():
+    assert graph.render_array('tan(x)', size=(4, 3), dpi=50).shape == (150, 200, 4)
@@ -0,0 +1,100 @@
+import threading
+import time
+
+from jobs import JobRunner
+
+
+class FakeRoot:
+    """Stand-in for Tk's root.after, callbacks run when pump() is called"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, func):
+        self.scheduled.append(func)
+
+    def pump(self, runner, limit=5):
+        """Runs scheduled polls until no job is pending"""
+
+        deadline = time.monotonic() + limit
+        while self.scheduled and time.monotonic() < deadline:
+            func = self.scheduled.pop(0)
+            func()
+            if self.scheduled:
+                time.sleep(0.01)
+        assert not runner.busy()
+
+
+def make_runner():
+    root = FakeRoot()
+    busy = []
+    return root, JobRunner(root.after, on_busy=busy.append), busy
+
+
+def test_result_handed_to_main_thread():
+    root, runner, busy = make_runner()
+    results = []
+    runner.submit(sum, [1, 2, 3], on_done=lambda result: results.append((result, threading.current_thread())))
+    root.pump(runner)
+    assert results == [(6, threading.main_thread())]
+    assert busy == [True, False]
+
+
+def test_error_handed_to_on_error():
+    root, runner, busy = make_runner()
+    errors = []
+    runner.submit(divmod, 1, 0, on_error=errors.append)
+    root.pump(runner)
+    assert isinstance(errors[0], ZeroDivisionError)
+
+
+def test_cancelled_job_callbacks_skipped():
+    root, runner, busy = make_runner()
+    results = []
+    job = runner.submit(time.sleep, 0.05, on_done=results.append)
+    job.cancel()
+    root.pump(runner)
+    assert results == []
+
+
+def test_stream_chunks_in_order():
+    root, runner, busy = make_runner()
+    chunks, done = [], []
+    runner.submit_stream(lambda n: (str(i) for i in range(n)), 5, on_chunk=chunks.append,
+                         on_done=done.append)
+    root.pump(runner)
+    assert chunks == ['0', '1', '2', '3', '4']
+    assert done == [None]
+
+
+def test_stream_error_after_chunks():
+    def failing():
+        yield 'partial'
+        raise RuntimeError('dropped')
+
+    root, runner, busy = make_runner()
+    chunks, errors = [], []
+    runner.submit_stream(failing, on_chunk=chunks.append, on_error=errors.append)
+    root.pump(runner)
+    assert chunks == ['partial']
+    assert str(errors[0]) == 'dropped'
+
+
+def test_cancelled_stream_stops():
+    release = threading.Event()
+    produced = []
+
+    def slow():
+        for i in range(100):
+            release.wait()
+            produced.append(i)
+            yield str(i)
+
+    root, runner, busy = make_runner()
+    chunks = []
+    job = runner.submit_stream(slow, on_chunk=chunks.append)
+    job.cancel()
+    release.set()
+    root.pump(runner)
+    assert chunks == []
+    assert len(produced) <= 1
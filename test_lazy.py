@@ -0,0 +1,38 @@
+import sys
+
+import pytest
+
+import benchmark
+import lazy
+
+
+@pytest.fixture
+def module(tmp_path, monkeypatch):
+    """Name of a module nothing has imported yet"""
+
+    (tmp_path / 'lazy_probe.py').write_text('value = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield 'lazy_probe'
+    sys.modules.pop('lazy_probe', None)
+
+
+def test_loaded_on_first_attribute(module):
+    probe = lazy.lazy_import(module)
+    assert not lazy.is_loaded(probe)
+    assert module not in sys.modules
+    assert 'not loaded' in repr(probe)
+
+    assert probe.value == 42
+    assert lazy.is_loaded(probe)
+    assert module in lazy.load_times
+    assert probe._load() is sys.modules[module]
+
+
+def test_already_imported_module_returned():
+    assert lazy.lazy_import('json') is sys.modules['json']
+    assert lazy.is_loaded(sys.modules['json'])
+
+
+def test_main_imports_stay_light():
+    # Pages import vector, graph, solver_ai, scipy and matplotlib when first opened
+    assert benchmark.main_imports() == ('argparse', 'customtkinter', 'profiling', 'calculator', 'jobs', 'lazy')
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import calculator
+import metrics
+import vector
+from calculator import calculate
+
+
+wrt_x = ['x', '', '', '', '', '']
+
+
+@pytest.fixture
+def recorded():
+    """Records metrics from a cold cache for the test"""
+
+    calculator.result_cache.clear()
+    metrics.recorder.reset()
+    metrics.enable()
+    yield metrics.recorder
+    metrics.enable(False)
+    metrics.recorder.reset()
+
+
+def test_operation_name():
+    assert calculator.operation_name('d/dx[x^2]') == 'd/dx'
+    assert calculator.operation_name('∫ [x]') == '∫'
+    assert calculator.operation_name('2+3') == 'regular'
+
+
+def test_cache_hits_recorded_per_operation(recorded):
+    calculate('d/dx[x^3]', wrt_x)
+    calculate('d/dx[x^3]', wrt_x)
+    calls = recorded.summary()['calculate']
+    assert set(calls['d/dx']) == {'hit', 'miss'}
+    assert calls['d/dx']['hit']['count'] == calls['d/dx']['miss']['count'] == 1
+    assert 'cache hit' not in calls
+
+
+def test_stages_timed(recorded):
+    calculate('∫[x^2]', wrt_x)
+    stages = recorded.summary()['calculate']['∫']['miss']['stages']
+    assert {'cache', 'clean', 'evaluate', 'str', 'post_clean', 'total'} <= set(stages)
+    assert stages['total']['sum'] >= stages['evaluate']['sum']
+
+
+def test_vector_failures_recorded(recorded):
+    with pytest.raises(ValueError):
+        vector.vector_calc('bogus', '[1]')
+    vector.vector_calc('add', '[1, 2]', '[3, 4]')
+    calls = recorded.summary()['vector_calc']
+    assert calls['unknown']['error']['count'] == 1
+    assert calls['add']['ok']['count'] == 1
+    assert calls['add']['ok']['result_size']['sum'] == 2
+
+
+def test_nothing_recorded_when_off():
+    metrics.recorder.reset()
+    assert metrics.start('calculate') is metrics.null_trace
+    calculate('2+3', wrt_x)
+    assert metrics.summary() == {}
+
+
+def test_prometheus_dump(recorded):
+    vector.vector_calc('add', '[1, 2]', '[3, 4]')
+    text = metrics.prometheus()
+    assert 'calc_calls_total{kind="vector_calc",operation="add",outcome="ok"} 1' in text
+    assert 'calc_stage_seconds{kind="vector_calc",operation="add",outcome="ok",stage="total",quantile="0.5"}' in text
+
+
+@pytest.mark.parametrize('value, size', [(None, 0), ('abc', 3), (np.zeros((2, 3)), 6), (('ab', np.zeros(2)), 4)])
+def test_size_of(value, size):
+    assert metrics.size_of(value) == size
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import numeric
+
+
+def test_scalar():
+    assert numeric.evaluate('sin(π/2) + 2') == pytest.approx(3)
+
+
+def test_vectorized_over_array():
+    xs = np.linspace(0, 1, 5)
+    np.testing.assert_allclose(numeric.evaluate('x^2 + 3x', x=xs), xs ** 2 + 3 * xs)
+
+
+def test_broadcast_between_variables():
+    xs = np.arange(3).reshape(3, 1)
+    ys = np.arange(4)
+    result = numeric.evaluate('xy + 1', x=xs, y=ys)
+    assert result.shape == (3, 4)
+    np.testing.assert_allclose(result, xs * ys + 1)
+
+
+def test_constant_broadcast_to_inputs():
+    result = numeric.evaluate('2 + 0x', x=np.zeros(4))
+    assert result.shape == (4,)
+    np.testing.assert_allclose(result, 2)
+
+
+def test_missing_variable():
+    with pytest.raises(ValueError, match='missing values for: y'):
+        numeric.evaluate('x + y', x=1)
+
+
+def test_compiled_once():
+    numeric.compiled_cache.clear()
+    assert numeric.compile_expr('x^3') is numeric.compile_expr('x ^ 3')
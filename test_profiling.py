@@ -0,0 +1,57 @@
+import pstats
+
+import pytest
+
+import profiling
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+@pytest.fixture
+def profiler(tmp_path, monkeypatch):
+    """Profiler writing to tmp_path, in place of the shared one"""
+
+    profiler = profiling.Profiler(str(tmp_path))
+    monkeypatch.setattr(profiling, 'profiler', profiler)
+    return profiler
+
+
+def test_files_written(profiler, tmp_path):
+    slow = profiling.profiled('slow', busy)
+    for _ in range(3):
+        assert slow(200_000) == busy(200_000)
+    profiler.flush()
+
+    stats = pstats.Stats(str(tmp_path / 'slow.pstats'))
+    assert any(func[2] == 'busy' for func in stats.stats)
+    lines = (tmp_path / 'slow.collapsed').read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(' ', 1)
+    assert stack.startswith('busy (test_profiling.py:')
+    assert int(count) > 0
+
+
+def test_every_nth_call(profiler):
+    profiler.every = 2
+    slow = profiling.profiled('slow', busy)
+    for _ in range(5):
+        slow(1000)
+    session = profiler.sessions['slow']
+    assert (session.calls, session.profiled) == (5, 3)
+
+
+def test_off_returns_function(monkeypatch):
+    monkeypatch.setattr(profiling, 'profiler', profiling.Profiler())
+    assert profiling.profiled('slow', busy) is busy
+
+
+def test_configure(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, 'profiler', profiling.Profiler())
+    monkeypatch.delenv('CALC_PROFILE', raising=False)
+    profiling.configure(str(tmp_path), every=4)
+    assert profiling.enabled()
+    assert profiling.profiler.every == 4
+    profiling.configure()
+    assert not profiling.enabled()
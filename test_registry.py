@@ -0,0 +1,71 @@
+import pytest
+
+import calculator
+import vector
+from registry import Registry
+
+
+@pytest.fixture
+def ops():
+    ops = Registry()
+    ops.register('add', lambda a, b: a + b, arity=2, parser=float, label='addition')
+    ops.register('scale', lambda a, k=2: a * k, optional=1, parser=float, cost='heavy')
+    return ops
+
+
+def test_call_parses_required_operands(ops):
+    assert ops.call('add', '1.5', '2') == 3.5
+
+
+def test_optional_operand_passed_raw_and_extra_dropped(ops):
+    assert ops.call('scale', '2') == 4
+    assert ops.call('scale', '2', 3) == 6
+    assert ops.call('add', '1', '2', 'ignored') == 3
+
+
+def test_too_few_operands(ops):
+    with pytest.raises(ValueError, match='add takes 2'):
+        ops.call('add', '1')
+
+
+def test_unknown_operation(ops):
+    with pytest.raises(ValueError, match='unknown operation'):
+        ops.call('bogus')
+    assert 'bogus' not in ops
+
+
+def test_labels_and_order(ops):
+    assert ops.by_label('addition').name == 'add'
+    assert ops.by_label('scale').name == 'scale'
+    assert ops.names() == ['add', 'scale']
+
+
+def test_unknown_cost_class():
+    with pytest.raises(ValueError):
+        Registry().register('x', abs, cost='expensive')
+
+
+def test_decorator():
+    ops = Registry()
+
+    @ops.register('neg')
+    def neg(a):
+        return -a
+
+    assert ops.call('neg', 2) == -2
+
+
+def test_vector_costs():
+    assert vector.operations.cost('det') == 'heavy'
+    assert vector.operations.cost('add') == 'cheap'
+    assert vector.operations.cost('curl') == 'symbolic'
+
+
+def test_vector_menu_labels():
+    assert vector.operations.by_label('cross product').name == 'cross'
+    assert len({op.label for op in vector.operations}) == len(vector.operations)
+
+
+def test_calculator_operations():
+    assert calculator.operations.names()[:5] == ['d/dx', '∫', 'lim', '∂/∂x', 'Σ']
+    assert calculator.operations.by_label('integral').name == '∫'
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+
+import pytest
+
+import executor
+import server
+import timeouts
+
+
+@pytest.fixture
+def pool():
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture
+def short_limit(monkeypatch):
+    """One second requests"""
+
+    monkeypatch.setattr(server, 'time_limit', 1)
+    monkeypatch.setattr(server, 'grace', 0.5)
+
+
+@pytest.fixture
+def url():
+    """Running server, yields its base url"""
+
+    httpd = server.make_server(port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(url, path, body):
+    """
+    :returns: (status, response json)
+    """
+
+    request = urllib.request.Request(url + path, json.dumps(body).encode(), {'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize('body', [
+    {'expr': "__import__('os').system('touch${IFS}/tmp/rce_marker')"},
+    {'expr': '(1).real'},
+    {'expr': '∫[x]', 'conditions': ['x', '', '0', "__import__('os')"]},
+    {'expr': 'x', 'conditions': 'x'},
+])
+def test_calculate_rejects_code(body):
+    with pytest.raises(ValueError):
+        server.calculate(body)
+
+
+@pytest.mark.parametrize('body', [
+    {'oper': 'add', 'a': '/tmp/secret.npy', 'b': '[0, 0, 0]'},
+    {'oper': 'add', 'a': '[0, 0, 0]', 'b': 'data.bin'},
+    {'oper': 'grad', 'a': 'x.__class__'},
+    {'oper': ['add'], 'a': '[1]'},
+])
+def test_vector_rejects_files_and_code(body):
+    with pytest.raises(ValueError):
+        server.vector(body)
+
+
+@pytest.mark.parametrize('body', [
+    {'expr': 'sin(x)', 'dpi': 100000},
+    {'expr': 'sin(x)', 'x_min': -1e300},
+    {'expr': 'sin(x)', 'x_min': 5, 'x_max': 1},
+    {'expr': 'sin(x)', 'x_max': float('nan')},
+])
+def test_render_limits(body):
+    with pytest.raises(ValueError):
+        server.render(body)
+
+
+def test_cheap_vector_request():
+    assert server.vector({'oper': 'cross', 'a': '[1, 0, 0]', 'b': '[0, 1, 0]'}) == {'result': '[0 0 1]'}
+
+
+def test_pool_size_kept(pool):
+    pool.get_pool(2)
+    assert server.calculate({'expr': 'd/dx[x^3]', 'conditions': ['x']}) == {'result': '3x^2'}
+    assert pool.pool_size() == 2
+    pool.get_pool(1)
+    assert pool.pool_size() == 1
+
+
+def test_stuck_worker_replaced(pool, short_limit):
+    pool.get_pool(1)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        server.calculate({'expr': '9^9^9'})
+    assert time.monotonic() - start < 5
+    assert pool.pool_size() == 1
+    assert server.calculate({'expr': '2+3'}) == {'result': '5'}
+
+
+def test_budget_timeout():
+    future = Future()
+    future.set_result(timeouts.CalcTimeout('integral', 2))
+    with pytest.raises(TimeoutError):
+        server.wait(future)
+
+
+def test_time_limit_caps_budgets(monkeypatch):
+    monkeypatch.setattr(timeouts, 'budgets', {'integral': None, 'limit': 5})
+    monkeypatch.setattr(server, 'time_limit', server.time_limit)
+    server.set_time_limit(10)
+    assert timeouts.budgets == {'integral': 10, 'limit': 5}
+    assert server.time_limit == 10
+
+
+@pytest.mark.parametrize('path, body, status', [
+    ('/vector', {'oper': 'add', 'a': '[1]'}, 400),
+    ('/vector', {'oper': 'bogus', 'a': '[1]'}, 400),
+    ('/vector', {'oper': 'norm', 'a': 'missing.npy'}, 400),
+    ('/generate', {'problem': 5}, 400),
+    ('/generate', {}, 400),
+    ('/calculate', {'expr': 'x', 'conditions': 5}, 400),
+    ('/vector', {'oper': 'add', 'a': '[1, 2]', 'b': '[3, 4]'}, 200),
+])
+def test_status(url, path, body, status):
+    assert post(url, path, body)[0] == status
+
+
+def test_timeout_status(url, pool, short_limit):
+    status, body = post(url, '/calculate', {'expr': '9^9^9'})
+    assert status == 504
+    assert 'longer than 1s' in body['error']
+
+
+def test_generate_timeout(url, monkeypatch, short_limit):
+    import solver_ai
+
+    class SlowBackend:
+        async def complete(self, messages):
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(solver_ai, 'solver', solver_ai.AsyncSolver(backend=SlowBackend(), local_threshold=None))
+    start = time.monotonic()
+    assert post(url, '/generate', {'problem': 'problem'})[0] == 504
+    assert time.monotonic() - start < 5
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from solver_ai import AsyncSolver, HTTPBackend, RetryableError, build_messages, local_solve
+
+
+# Keyword guesses used to answer these locally, wrongly (15, 63, 9)
+misread = [
+    'Tom bought 3 boxes with 12 apples each. How many apples in total?',
+    'A car drives 60 miles per hour for 3 hours. What is the total distance?',
+    'There are 5 bags of 4 marbles. How many marbles are there altogether?',
+]
+
+
+class FakeBackend:
+    """Backend answering every problem with the same text"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def complete(self, messages):
+        self.calls += 1
+        return 'remote answer'
+
+
+@pytest.mark.parametrize('problem', misread)
+def test_word_problems_not_answered_locally(problem):
+    answer, confidence = local_solve(problem)
+    assert confidence < 0.8
+
+
+@pytest.mark.parametrize('problem', misread)
+def test_word_problems_sent_to_backend(problem):
+    backend = FakeBackend()
+    solver = AsyncSolver(backend=backend)
+    assert asyncio.run(solver.solve(problem)) == 'remote answer'
+    assert backend.calls == 1
+
+
+def test_comparison_answered_locally():
+    answer, confidence = local_solve('Tom has 5 apples. Sue has 3 apples. How many more apples does Tom have?')
+    assert answer == 'The answer is 2.'
+    assert confidence >= 0.8
+
+
+def test_comparison_against_named_person():
+    answer, confidence = local_solve('Tom has 5 apples, and Sue has 9 apples. How many fewer apples does Tom have than Sue?')
+    assert answer == 'The answer is 4.'
+
+
+@pytest.mark.parametrize('problem', [
+    'Tom has 5 apples. Sue has 3 apples. How many more apples does Sue need to have twice as many as Tom?',
+    'Tom has 5 apples. Sue has 3 apples. How many more apples does Sue have than Tom?',
+    'Tom has 5 apples. Sue has 3 apples. How many more apples does Bob have?',
+])
+def test_other_comparisons_not_answered(problem):
+    assert local_solve(problem) == (None, 0)
+
+
+def test_comparison_of_different_things_not_answered():
+    assert local_solve('Tom has 5 apples. Sue has 3 pears. How many more apples does Tom have?') == (None, 0)
+
+
+def test_expressions_and_equations_answered_locally():
+    assert local_solve('what is 2 plus 2') == ('2+2 = 4', 0.95)
+    assert local_solve('2x + 3 = 11') == ('x = 4', 0.95)
+
+
+@pytest.mark.parametrize('problem', ['what is 5 / 0', '3x', '7', 'x = x + 1', 'what is 9^9^9'])
+def test_non_answers_not_answered_locally(problem):
+    assert local_solve(problem) == (None, 0)
+
+
+# ---------------- Solver / backends ----------------
+
+class FlakyBackend:
+    """Backend failing with a retryable error a number of times before answering"""
+
+    def __init__(self, failures=0, chunks=('remote ', 'answer')):
+        self.failures = failures
+        self.chunks = chunks
+        self.calls = 0
+
+    async def complete(self, messages):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RetryableError('HTTP 503')
+        return ''.join(self.chunks)
+
+    async def stream(self, messages):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RetryableError('HTTP 503')
+        for chunk in self.chunks:
+            yield chunk
+
+
+def remote_solver(backend, **kwargs):
+    return AsyncSolver(backend=backend, backoff=0, local_threshold=None, **kwargs)
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_retried_after_retryable_errors():
+    backend = FlakyBackend(failures=2)
+    assert asyncio.run(remote_solver(backend).solve('problem')) == 'remote answer'
+    assert backend.calls == 3
+
+
+def test_retries_exhausted():
+    backend = FlakyBackend(failures=10)
+    with pytest.raises(RetryableError):
+        asyncio.run(remote_solver(backend, retries=2).solve('problem'))
+    assert backend.calls == 3
+
+
+def test_answers_cached_on_disk(tmp_path):
+    backend = FlakyBackend()
+    assert asyncio.run(remote_solver(backend, cache_dir=str(tmp_path)).solve('problem')) == 'remote answer'
+    solver = remote_solver(backend, cache_dir=str(tmp_path))
+    assert asyncio.run(solver.solve('problem')) == 'remote answer'
+    assert backend.calls == 1
+    assert solver.routed['cache'] == 1
+
+
+def test_memory_bounded():
+    solver = remote_solver(FlakyBackend(), memory_size=2)
+    asyncio.run(solver.solve_many(['a', 'b', 'c']))
+    assert len(solver.memory) == 2
+
+
+def test_identical_problems_share_a_request():
+    backend = FlakyBackend()
+    assert asyncio.run(remote_solver(backend).solve_many(['a', 'a', 'a'])) == ['remote answer'] * 3
+    assert backend.calls == 1
+
+
+def test_stream_cached():
+    backend = FlakyBackend()
+    solver = remote_solver(backend)
+    assert asyncio.run(collect(solver.stream('problem'))) == ['remote ', 'answer']
+    assert asyncio.run(collect(solver.stream('problem'))) == ['remote answer']
+    assert backend.calls == 1
+    assert solver.latency_stats()['count'] == 2
+
+
+def test_empty_stream_not_cached(tmp_path):
+    backend = FlakyBackend(chunks=())
+    solver = remote_solver(backend, cache_dir=str(tmp_path))
+    assert asyncio.run(collect(solver.stream('problem'))) == []
+    assert asyncio.run(collect(solver.stream('problem'))) == []
+    assert backend.calls == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Chat completions stand-in: fails the first `failures` requests, then answers"""
+
+    protocol_version = 'HTTP/1.1'
+    failures = 0
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        type(self).requests.append((self.path, self.headers.get('Authorization'), body))
+        if len(self.requests) <= self.failures:
+            self.reply(503, b'{}', 'application/json')
+        elif body.get('stream'):
+            events = [{'choices': [{'delta': {'content': text}}]} for text in ('2 + 2', ' = 4')]
+            data = ''.join(f'data: {json.dumps(event)}\n\n' for event in events) + 'data: [DONE]\n\n'
+            self.reply(200, data.encode(), 'text/event-stream')
+        else:
+            answer = {'choices': [{'message': {'content': '2 + 2 = 4'}}]}
+            self.reply(200, json.dumps(answer).encode(), 'application/json')
+
+    def reply(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    """Stand-in chat completions server, yields its base url"""
+
+    handler = type('Handler', (StandInHandler,), {'requests': [], 'failures': 0})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield handler, f'http://127.0.0.1:{server.server_address[1]}/v1'
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_backend_complete(stand_in):
+    handler, url = stand_in
+    backend = HTTPBackend(url, key='test-key')
+    messages = build_messages('2 + 2')
+    assert asyncio.run(backend.complete(messages)) == '2 + 2 = 4'
+    path, authorization, body = handler.requests[0]
+    assert path == '/v1/chat/completions'
+    assert authorization == 'Bearer test-key'
+    assert body['messages'] == messages
+    backend.close()
+
+
+def test_http_backend_stream(stand_in):
+    handler, url = stand_in
+    backend = HTTPBackend(url, key='')
+    assert asyncio.run(collect(backend.stream(build_messages('2 + 2')))) == ['2 + 2', ' = 4']
+    backend.close()
+
+
+def test_http_backend_retried_by_solver(stand_in):
+    handler, url = stand_in
+    handler.failures = 2
+    solver = remote_solver(HTTPBackend(url, key=''))
+    assert asyncio.run(solver.solve('2 + 2')) == '2 + 2 = 4'
+    assert len(handler.requests) == 3
+    solver.backend.close()
+
+
+def test_generate_stream(monkeypatch):
+    import solver_ai
+    monkeypatch.setattr(solver_ai, 'solver', remote_solver(FlakyBackend()))
+    assert list(solver_ai.generate_stream('problem')) == ['remote ', 'answer']
+    assert solver_ai.generate('problem') == 'remote answer'
+
+
+def test_generate_stream_closed_early(monkeypatch):
+    import solver_ai
+    monkeypatch.setattr(solver_ai, 'solver', remote_solver(FlakyBackend()))
+    chunks = solver_ai.generate_stream('problem')
+    assert next(chunks) == 'remote '
+    chunks.close()
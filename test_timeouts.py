@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import calculator
+import timeouts
+from timeouts import CalcTimeout, budget_for, run_with_timeout
+
+
+wrt_x = ['x', '', '', '', '', '']
+
+
+@pytest.fixture
+def spawn(monkeypatch):
+    """Starts children like macOS / Windows do, re-importing everything"""
+
+    monkeypatch.setattr(timeouts.multiprocessing, 'Process', multiprocessing.get_context('spawn').Process)
+
+
+def test_result_within_budget():
+    assert run_with_timeout('regular', 5, sum, [1, 2, 3]) == 6
+
+
+def test_budget_exceeded():
+    assert run_with_timeout('regular', 0.2, time.sleep, 5) == CalcTimeout('regular', 0.2)
+
+
+def test_error_in_child():
+    with pytest.raises(RuntimeError, match='ZeroDivisionError'):
+        run_with_timeout('regular', 5, divmod, 1, 0)
+
+
+def test_child_dying_without_result():
+    with pytest.raises(RuntimeError, match='without a result'):
+        run_with_timeout('regular', 5, os._exit, 1)
+
+
+def test_budget_excludes_spawn_start_up(spawn):
+    # The spawn child re-imports sympy / calculator, taking longer than the budget
+    result = run_with_timeout('derivative', 0.3, calculator.apply_operation,
+                              'd/dx', calculator.parse('x**2'), calculator.x, wrt_x)
+    assert str(result) == '2*x'
+
+
+def test_start_up_limited(spawn, monkeypatch):
+    monkeypatch.setattr(timeouts, 'startup_limit', 0.01)
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match='did not start'):
+        run_with_timeout('regular', 5, time.sleep, 30)
+    assert time.perf_counter() - start < 5
+
+
+def test_budget_for():
+    assert budget_for('integral', wrt_x + ['2']) == 2.0
+    assert budget_for('integral', wrt_x + ['0']) is None
+    timeouts.budgets['integral'], saved = 3.0, timeouts.budgets['integral']
+    try:
+        assert budget_for('integral', wrt_x) == 3.0
+    finally:
+        timeouts.budgets['integral'] = saved
+
+
+def test_calculate_times_out():
+    assert calculator.calculate('9^9^9', ['', '', '', '', '', '', '0.5']) == CalcTimeout('regular', 0.5)
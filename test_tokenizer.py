@@ -0,0 +1,80 @@
+import pytest
+
+from tokenizer import check_input, from_sympy, to_sympy
+
+
+variables = ['x', 'y', 'z']
+
+
+@pytest.mark.parametrize('expr, cleaned', [
+    ('6x', '6*x'),
+    ('2.5x', '2.5*x'),
+    ('6 x', '6*x'),
+    ('2sin(x)', '2*sin(x)'),
+    ('x(x+1)', 'x*(x+1)'),
+    ('(x+1)(x-1)', '(x+1)*(x-1)'),
+    ('(x+1)x', '(x+1)*x'),
+    ('xy', 'x*y'),
+    ('x^2', 'x**2'),
+    ('e^x', 'E**x'),
+    ('sec(x)e', 'sec(x)*E'),
+    ('π', 'pi'),
+    ('ln(x)', 'log(x)'),
+    ('arcsin(x)', 'asin(x)'),
+])
+def test_to_sympy(expr, cleaned):
+    assert to_sympy(expr, variables) == cleaned
+
+
+def test_to_sympy_without_implicit_multiplication():
+    assert to_sympy('6x', variables, implicit=False) == '6x'
+    assert to_sympy('xy', variables, implicit=False) == 'xy'
+
+
+def test_to_sympy_keeps_function_names():
+    assert to_sympy('sin(x)+exp(y)', variables) == 'sin(x)+exp(y)'
+
+
+@pytest.mark.parametrize('expr, readable', [
+    ('x**2', 'x^2'),
+    ('2*x', '2x'),
+    ('pi', 'π'),
+    ('E', 'e'),
+    ('asin(x)', 'arcsin(x)'),
+    ('log(x)', 'log(x)'),
+    ('exp(x)', 'e^x'),
+    ('exp(2*x)', 'e^(2x)'),
+    ('exp(-x)', 'e^(-x)'),
+    ('x*exp(x)', 'xe^x'),
+])
+def test_from_sympy(expr, readable):
+    assert from_sympy(expr) == readable
+
+
+@pytest.mark.parametrize('expr', ['6x(x+1)^2', 'sec(x)e', 'arcsin(x)', 'e^x', 'x^2y'])
+def test_round_trip(expr):
+    assert from_sympy(to_sympy(expr, variables)) == expr
+
+
+
+@pytest.mark.parametrize('expr', [
+    'd/dx[x^2]', '∂/∂x[x^2y]', '∫[x e^x]', 'lim[sin(x)/x]', 'Σ[1/n^2]',
+    '[x y, y z, z x]', '[1, 2; 3, 4]', '[1+2i, 3]', '[1.5e10, 2]', '0, 2π', '-oo',
+])
+def test_check_input_accepts_math(expr):
+    assert check_input(expr) == expr
+
+
+@pytest.mark.parametrize('expr', [
+    "__import__('os').system('touch${IFS}/tmp/rce_marker')",
+    '(1).real',
+    'x.free_symbols',
+    'eval(1)',
+    'Symbol("x")',
+    'lambda: 1',
+    '/tmp/secret.npy',
+    'data.bin:float32',
+])
+def test_check_input_rejects_code(expr):
+    with pytest.raises(ValueError):
+        check_input(expr)
@@ -0,0 +1,220 @@
+import numpy as np
+import pytest
+
+import vector
+
+
+# ---------------- Parsing ----------------
+
+@pytest.mark.parametrize('text', ['[1, 2, 3]', '(1, 2, 3)', '[1,2,3]'])
+def test_vector_parsed_as_int(text):
+    arr = vector.str_to_ndarray(text)
+    assert arr.dtype == np.int64
+    assert arr.tolist() == [1, 2, 3]
+
+
+@pytest.mark.parametrize('text', ['[1, 2; 3, 4]', '[[1, 2], [3, 4]]'])
+def test_matrix_rows(text):
+    arr = vector.str_to_ndarray(text)
+    assert arr.shape == (2, 2)
+    assert arr.tolist() == [[1, 2], [3, 4]]
+
+
+def test_nested_any_depth():
+    arr = vector.str_to_ndarray('[[[1, 2], [3, 4]], [[5, 6], [7, 8]]]')
+    assert arr.shape == (2, 2, 2)
+    np.testing.assert_array_equal(arr, np.arange(1, 9).reshape(2, 2, 2))
+
+
+@pytest.mark.parametrize('text, expected', [('[1.5, 2]', [1.5, 2.0]), ('[1e3, 2]', [1000.0, 2.0])])
+def test_float(text, expected):
+    arr = vector.str_to_ndarray(text)
+    assert arr.dtype == np.float64
+    assert arr.tolist() == expected
+
+
+@pytest.mark.parametrize('text', ['[1+2i, 3]', '[1+2j, 3]'])
+def test_complex(text):
+    arr = vector.str_to_ndarray(text)
+    assert arr.dtype == np.complex128
+    assert arr.tolist() == [1 + 2j, 3]
+
+
+def test_not_numbers():
+    with pytest.raises(ValueError):
+        vector.str_to_ndarray('[1, a]')
+
+
+# ---------------- Linear algebra ----------------
+
+def test_det_in_float_range():
+    assert vector.vector_calc('det', '[1, 2; 3, 4]') == pytest.approx(-2)
+
+
+def test_det_past_float_range():
+    # 100^200 overflows a float, slogdet keeps it
+    assert vector.det(np.diag(np.full(200, 100.0))) == '1.000000e+400'
+    assert vector.det(-np.diag(np.full(201, 100.0))) == '-1.000000e+402'
+    assert vector.det(np.diag(np.full(200, 300.0))) == '2.656140e+495'
+
+
+def test_matmul():
+    np.testing.assert_array_equal(vector.vector_calc('matmul', '[1, 2; 3, 4]', '[1, 1]'), [3, 7])
+
+
+def test_solve():
+    a, b = '[3, 1; 1, 2]', '[9, 8]'
+    x = vector.vector_calc('solve', a, b)
+    np.testing.assert_allclose(vector.str_to_ndarray(a) @ x, [9, 8])
+
+
+def test_inverse():
+    np.testing.assert_allclose(vector.vector_calc('inv', '[2, 0; 0, 4]'), [[0.5, 0], [0, 0.25]])
+
+
+def test_rank():
+    assert vector.vector_calc('rank', '[1, 2; 2, 4]') == 1
+    assert vector.vector_calc('rank', '[1, 2; 3, 4]') == 2
+
+
+@pytest.mark.parametrize('text, expected', [('[2, 1; 1, 2]', [1, 3]), ('[1, 2; 0, 3]', [1, 3])])
+def test_eigenvalues(text, expected):
+    np.testing.assert_allclose(sorted(vector.vector_calc('eig', text)), expected)
+
+
+@pytest.mark.parametrize('oper', ['lu', 'qr', 'svd'])
+def test_decompositions_reconstruct(oper):
+    a = vector.str_to_ndarray('[4, 3; 6, 3; 1, 2]').astype(float)
+    factors = vector.vector_calc(oper, '[4, 3; 6, 3; 1, 2]')
+    if oper == 'svd':
+        u, s, vh = factors
+        assert u.shape == (3, 2)
+        product = u @ np.diag(s) @ vh
+    else:
+        product = np.linalg.multi_dot(factors)
+    np.testing.assert_allclose(product, a)
+
+
+# ---------------- File operands ----------------
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Chunk size small enough that test operands span several chunks"""
+
+    monkeypatch.setattr(vector, 'chunk_size', 1000)
+
+
+def test_npy_operands_streamed(tmp_path, small_chunks):
+    a = np.linspace(-1, 1, 10_007)
+    b = np.cos(np.arange(10_007))
+    np.save(tmp_path / 'a.npy', a)
+    np.save(tmp_path / 'b.npy', b)
+    assert isinstance(vector.load_operand(str(tmp_path / 'a.npy')), np.memmap)
+
+    assert vector.vector_calc('dot', str(tmp_path / 'a.npy'), str(tmp_path / 'b.npy')) == pytest.approx(a @ b)
+    assert vector.vector_calc('norm', str(tmp_path / 'a.npy')) == pytest.approx(np.linalg.norm(a))
+
+
+def test_raw_operand_with_dtype_and_shape(tmp_path, small_chunks):
+    a = np.arange(6000, dtype=np.float32)
+    a.tofile(tmp_path / 'a.bin')
+    assert vector.load_operand(f'{tmp_path / "a.bin"}:float32:2000x3').shape == (2000, 3)
+    assert vector.vector_calc('norm', f'{tmp_path / "a.bin"}:float32') == pytest.approx(np.linalg.norm(a))
+
+
+def test_norm_scaled_against_overflow(tmp_path, small_chunks):
+    np.save(tmp_path / 'a.npy', np.full(4000, 1e200))
+    assert vector.vector_calc('norm', str(tmp_path / 'a.npy')) == pytest.approx(1e200 * np.sqrt(4000))
+
+
+@pytest.mark.parametrize('text, is_file', [
+    ('/tmp/secret.npy', True),
+    ('data.bin:float32:4x4', True),
+    ('[1, 2, 3]', False),
+])
+def test_file_operands(text, is_file):
+    assert vector.is_file_operand(text) == is_file
+
+
+@pytest.mark.parametrize('name', ['missing.npy', 'missing.bin', 'missing.dat:int32'])
+def test_missing_file_operand(tmp_path, name):
+    with pytest.raises(FileNotFoundError):
+        vector.vector_calc('norm', str(tmp_path / name))
+
+
+# ---------------- Batched operations ----------------
+
+rng = np.random.default_rng(0)
+batch_a = rng.normal(size=(50, 3))
+batch_b = rng.normal(size=(50, 3))
+
+
+@pytest.mark.parametrize('oper', ['add', 'sub', 'dot', 'cross', 'projection'])
+def test_batch_matches_pairwise(oper):
+    batched = vector.batch_vector_calc(oper, batch_a, batch_b)
+    pairwise = [vector.vector_calc(oper, a, b) for a, b in zip(batch_a, batch_b)]
+    np.testing.assert_allclose(batched, pairwise)
+
+
+def test_batch_norm():
+    np.testing.assert_allclose(vector.batch_vector_calc('norm', batch_a), np.linalg.norm(batch_a, axis=1))
+
+
+def test_batch_from_text():
+    a, b = '[1, 0, 0; 0, 1, 0]', '[0, 1, 0; 0, 0, 1]'
+    assert vector.batch_vector_calc('cross', a, b).tolist() == [[0, 0, 1], [1, 0, 0]]
+
+
+def test_no_batched_version():
+    with pytest.raises(ValueError):
+        vector.batch_vector_calc('det', batch_a)
+
+
+# ---------------- Arc length ----------------
+
+def test_arc_length_bounds():
+    assert float(vector.vector_calc('length', '[t, 0, 0]', '0, 3')) == pytest.approx(3)
+    assert float(vector.vector_calc('length', '[t, 0, 0]')) == pytest.approx(1)
+
+
+@pytest.mark.parametrize('method', ['quad', 'gauss'])
+def test_helix_length(method):
+    length = vector.arc_length('[cos(t), sin(t), t]', '0, 2π', method=method)
+    assert float(length) == pytest.approx(2 * np.pi * np.sqrt(2))
+
+
+def test_arc_lengths_over_intervals():
+    lengths = vector.arc_lengths(['[t, 0, 0]', '[t^2, 0, 0]'], [(0, 1), (1, 2), (0, 3)])
+    np.testing.assert_allclose(lengths, [[1, 1, 3], [1, 3, 9]])
+
+
+def test_speed_compiled_once():
+    vector.speed_cache.clear()
+    assert vector.speed_function('[t, 2t, 0]') is vector.speed_function('[t, 2 t, 0]')
+    np.testing.assert_allclose(vector.speed_function('[t, 2t, 0]')(np.zeros(3)), np.full(3, np.sqrt(5)))
+
+
+# ---------------- Symbolic operations ----------------
+
+def test_derivative_prints_e():
+    assert str(vector.vector_calc('deriv', '[e^t, t^2, sin(t)]')) == '[e^t, 2t, cos(t)]'
+
+
+def test_derivative_order():
+    assert str(vector.vector_calc('deriv', '[t^3, t, 1]', '2')) == '[6t, 0, 0]'
+
+
+def test_derivative_result_is_symbolic():
+    result = vector.vector_calc('deriv', '[t^2, 0, 0]')
+    assert result == vector.SymbolicResult([2 * vector.t, 0, 0])
+    assert len(result) == 3
+
+
+def test_curl_multiplies_adjacent_variables():
+    assert str(vector.vector_calc('curl', '[x y, y z, z x]')) == '[-y, -z, -x]'
+
+
+def test_higher_derivatives_built_on_cached():
+    vector.diff_cache.clear()
+    vector.diff(vector.t ** 5, vector.t, 3)
+    assert len(vector.diff_cache) == 3
@@ -0,0 +1,140 @@
+"""
+File: timeouts.py
+Description:
+    Implements wall-clock budgets per operation type so a runaway sympy
+    integral / limit can be stopped. Budgeted work runs in a child process
+    that is killed once its budget runs out.
+
+    Budgets (seconds) are read from CALC_TIMEOUT_<TYPE> environment
+    variables, ex. CALC_TIMEOUT_INTEGRAL=30, and are off by default.
+    A child that hasn't started within CALC_TIMEOUT_STARTUP (default 60)
+    seconds is killed too.
+"""
+
+import multiprocessing
+import os
+
+
+operation_types = ['derivative', 'integral', 'limit', 'series', 'regular']
+
+def read_budget(name):
+    """
+    :param name: environment variable name
+    :returns: budget in seconds or None
+    """
+
+    value = os.getenv(name, '')
+    return float(value) if value else None
+
+# Seconds allowed per operation type (None = unlimited, runs in this process)
+budgets = {op: read_budget('CALC_TIMEOUT_' + op.upper()) for op in operation_types}
+
+# Seconds a child may take to start (imports under spawn) before it's treated as stuck
+startup_limit = read_budget('CALC_TIMEOUT_STARTUP') or 60
+
+
+class CalcTimeout:
+    """Result of an operation that ran past its budget"""
+
+    def __init__(self, operation, seconds):
+        """
+        :param operation: operation type
+        :param seconds: budget that was exceeded
+        """
+
+        self.operation = operation
+        self.seconds = seconds
+
+    def __str__(self):
+        return f'TIMEOUT ({self.operation} > {self.seconds:g}s)'
+
+    def __repr__(self):
+        return f'CalcTimeout({self.operation!r}, {self.seconds!r})'
+
+    def __eq__(self, other):
+        return isinstance(other, CalcTimeout) and \
+            (self.operation, self.seconds) == (other.operation, other.seconds)
+
+
+def budget_for(operation, conditions=None):
+    """
+    Gets the budget for an operation type, a 7th conditions
+    slot (seconds) overrides the configured budget
+
+    :param operation: operation type
+    :param conditions: list of function conditionals
+    :returns: budget in seconds or None
+    """
+
+    if conditions is not None and len(conditions) > 6 and str(conditions[6]).strip() != '':
+        seconds = float(conditions[6])
+        return seconds if seconds > 0 else None
+    return budgets.get(operation)
+
+def _run_child(conn, func, args):
+    """
+    Child process body, sends None once started (imports done),
+    then (ok, value) back through the pipe
+
+    :param conn: write end of pipe
+    :param func: function to run
+    :param args: function arguments
+    """
+
+    try:
+        conn.send(None)
+        conn.send((True, func(*args)))
+    except Exception as e:
+        conn.send((False, repr(e)))
+    finally:
+        conn.close()
+
+def run_with_timeout(operation, seconds, func, *args):
+    """
+    Runs a function in a child process, killing it once the budget runs out
+
+    :param operation: operation type (for the timeout result)
+    :param seconds: budget in seconds
+    :param func: picklable function to run
+    :param args: function arguments
+    :returns: function result, or CalcTimeout if budget exceeded
+    """
+
+    recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+    child = multiprocessing.Process(target=_run_child, args=(send_conn, func, args), daemon=True)
+    child.start()
+    send_conn.close()
+
+    try:
+        # Budget starts once the child is running, not while it starts up
+        # (spawn start method re-imports sympy / the app in the child)
+        if not recv_conn.poll(startup_limit):
+            child.terminate()
+            raise RuntimeError(f'child process did not start within {startup_limit:g}s')
+        try:
+            started = recv_conn.recv()
+        except EOFError:
+            raise RuntimeError('child process exited before starting') from None
+        if started is not None:
+            raise RuntimeError('unexpected message from child')
+        if not recv_conn.poll(seconds):
+            child.terminate()
+            return CalcTimeout(operation, seconds)
+        try:
+            ok, value = recv_conn.recv()
+        except EOFError:
+            raise RuntimeError('child process exited without a result') from None
+    finally:
+        recv_conn.close()
+        child.join()
+
+    if not ok:
+        raise RuntimeError(value)
+    return value
+
+
+# Test:
+if __name__ == '__main__':
+    import time
+    print(run_with_timeout('regular', 0.5, time.sleep, 2))
+    print(run_with_timeout('regular', 2, sum, [1, 2, 3]))
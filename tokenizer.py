@@ -0,0 +1,234 @@
+"""
+File: tokenizer.py
+Description:
+    Implements a single pass, linear time tokenizer shared by calculator.py
+    and vector.py for turning user input into sympy readable syntax
+    (implicit multiplication, '^' -> '**', function names) and back.
+"""
+
+import re
+
+
+# Numbers, names (unicode letters like π included), '**', whitespace, or any single char
+token_pattern = re.compile(r'\d+\.?\d*|\.\d+|[^\W\d_]\w*|\*\*|\s+|.')
+
+# User input name -> sympy name
+to_sympy_names = {
+    'π': 'pi',
+    'e': 'E',
+    'ln': 'log',
+    'arcsin': 'asin',
+    'arccos': 'acos',
+    'arctan': 'atan',
+    'arcsec': 'asec',
+    'arccsc': 'acsc',
+    'arccot': 'acot',
+}
+
+# Sympy name -> user readable name ('log' kept, sympy prints ln as log)
+from_sympy_names = {
+    'pi': 'π',
+    'E': 'e',
+    'asin': 'arcsin',
+    'acos': 'arccos',
+    'atan': 'arctan',
+    'asec': 'arcsec',
+    'acsc': 'arccsc',
+    'acot': 'arccot',
+}
+
+# Names that are values (not function calls) when followed by '('
+constants = ['π', 'e', 'pi', 'E', 'oo']
+
+# Names untrusted input may contain (see check_input): variables, constants, functions, operations
+safe_names = {
+    'x', 'y', 'z', 't', 'n', 'i', 'j', 'inf', 'I', *constants,
+    'sin', 'cos', 'tan', 'sec', 'csc', 'cot', 'sinh', 'cosh', 'tanh',
+    'asin', 'acos', 'atan', 'asec', 'acsc', 'acot', *to_sympy_names,
+    'ln', 'log', 'sqrt', 'exp', 'abs',
+    'd', 'dx', 'lim', 'Σ',
+}
+
+# Operator characters untrusted input may contain
+safe_ops = set('+-*/^()[],.;∫∂') | {'**'}
+
+
+def tokenize(expr):
+    """
+    Splits an expression into (kind, text) tokens
+
+    :param expr: expression
+    :returns: list of tokens, kind is one of 'num', 'name', 'space', 'op'
+    """
+
+    tokens = []
+    for match in token_pattern.finditer(expr):
+        text = match.group()
+        first = text[0]
+        if first.isdigit() or (first == '.' and len(text) > 1):
+            tokens.append(('num', text))
+        elif first.isalpha():
+            tokens.append(('name', text))
+        elif first.isspace():
+            tokens.append(('space', text))
+        else:
+            tokens.append(('op', text))
+    return tokens
+
+def is_value(token, variables):
+    """
+    Checks if a token ends a multiplicable value (number, variable, constant, ')')
+
+    :param token: (kind, text) token
+    :param variables: list of variable names
+    :returns: bool
+    """
+
+    kind, text = token
+    return kind == 'num' or (kind == 'name' and (text in variables or text in constants)) \
+        or text == ')'
+
+def split_variables(tokens, variables):
+    """
+    Splits names made only of single letter variables / constants
+    into one token per letter (xy -> x y, so it reads x*y, xe -> x*E)
+
+    :param tokens: list of tokens
+    :param variables: list of variable names
+    :returns: list of tokens
+    """
+
+    out = []
+    for kind, text in tokens:
+        if kind == 'name' and len(text) > 1 and text not in variables and text not in to_sympy_names \
+                and all(char in variables or char in constants for char in text):
+            out += [('name', char) for char in text]
+        else:
+            out.append((kind, text))
+    return out
+
+def to_sympy(expr, variables=(), implicit=True):
+    """
+    Translates user input into sympy readable syntax
+
+    :param expr: expression
+    :param variables: variable names for implicit multiplication (ex. 6x -> 6*x, xy -> x*y)
+    :param implicit: insert '*' for implicit multiplication
+    :returns: sympy readable expression string
+    """
+
+    tokens = tokenize(expr)
+    if implicit:
+        tokens = split_variables(tokens, variables)
+
+    out = []
+    prev = None
+    for token in tokens:
+        kind, text = token
+        if kind == 'space':
+            continue
+
+        # Lack of * sign: 6x, xy, 2sin(x), x(x+1), (x+1)(x-1), (x+1)x
+        if implicit and prev is not None and is_value(prev, variables) and \
+            (kind == 'name' or text == '(' or (kind == 'num' and prev[0] != 'num')):
+            out.append('*')
+
+        if kind == 'name':
+            out.append(to_sympy_names.get(text, text))
+        elif text == '^':
+            out.append('**')
+        else:
+            out.append(text)
+        prev = token
+    return ''.join(out)
+
+def closing(tokens, start):
+    """
+    :param tokens: list of tokens
+    :param start: index of a '(' token
+    :returns: index of its matching ')' (len(tokens) if unmatched)
+    """
+
+    depth = 0
+    for i in range(start, len(tokens)):
+        if tokens[i][1] == '(':
+            depth += 1
+        elif tokens[i][1] == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(tokens)
+
+def from_tokens(tokens):
+    """
+    :param tokens: sympy expression tokens
+    :returns: user readable expression string (see from_sympy)
+    """
+
+    out = []
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+
+        # exp(t) -> e^t, exp(2*t) -> e^(2t)
+        if text == 'exp' and i + 1 < len(tokens) and tokens[i + 1][1] == '(':
+            end = closing(tokens, i + 1)
+            inner = tokens[i + 2:end]
+            power = from_tokens(inner)
+            if len(inner) == 1 and inner[0][0] in ('num', 'name'):
+                out.append('e^' + power)
+            else:
+                out.append('e^(' + power + ')')
+            i = end + 1
+            continue
+
+        if kind == 'name':
+            out.append(from_sympy_names.get(text, text))
+        elif text == '**':
+            out.append('^')
+        elif text != '*':
+            out.append(text)
+        i += 1
+    return ''.join(out)
+
+def check_input(expr, names=safe_names, variables=('t', 'x', 'y', 'z')):
+    """
+    Checks untrusted input (server requests) only holds math, since parsing
+    evaluates python: no underscores, quotes, attribute access, or names
+    outside of names (adjacent variables, ex. xy, count as one each)
+
+    :param expr: expression
+    :param names: allowed names
+    :param variables: single letter variables for splitting names
+    :returns: expr
+    :raises ValueError: if anything else is found
+    """
+
+    tokens = [token for token in split_variables(tokenize(expr), variables) if token[0] != 'space']
+    for i, (kind, text) in enumerate(tokens):
+        exponent = i > 0 and tokens[i - 1][0] == 'num' and re.fullmatch(r'[eE]\d+', text)  # 1e5
+        if kind == 'name' and text not in names and not exponent:
+            raise ValueError(f'unknown name: {text}')
+        if kind == 'op' and text not in safe_ops:
+            raise ValueError(f'character not allowed: {text}')
+        if text == '.' and i + 1 < len(tokens) and tokens[i + 1][0] == 'name':
+            raise ValueError('attribute access not allowed')
+    return expr
+
+def from_sympy(expr):
+    """
+    Translates sympy output into user readable syntax ('**' -> '^', '*' -> '', exp(t) -> e^t)
+
+    :param expr: sympy expression string
+    :returns: user readable expression string
+    """
+
+    return from_tokens(tokenize(expr))
+
+
+# Test:
+if __name__ == '__main__':
+    cleaned = to_sympy('6x(x+1)^2 + sec(x)e - arcsin(x) + xy', ['x', 'y', 'z'])
+    print(cleaned)
+    print(from_sympy(cleaned))
+    print(from_sympy('2*exp(t) + exp(-t**2)'))
@@ -5,16 +5,44 @@ Description:
     expressions than in calculator.py, for the functions page in main.py.
 """
 
+import math
+import os
+import re
+import time
+import warnings
+
 import numpy as np
 import sympy as smp
-from scipy.integrate import quad
+import metrics
+from cache import ExpressionCache
 from calculator import post_clean
+from expr_store import parse
+from lazy import lazy_import
+from registry import Registry
+from tokenizer import to_sympy
 
 
 # Symbolic initialization
 t, x, y, z = smp.symbols('t x y z')
 poss_vars = ['t', 'x', 'y', 'z']
 operators = ['+', '-', '*', '/', '^']
+strip_brackets = str.maketrans('', '', '[]()')
+
+# scipy takes longer to import than the rest of this module, only load it when needed
+scipy_linalg = lazy_import('scipy.linalg')
+scipy_integrate = lazy_import('scipy.integrate')
+
+# Raw binary operand: path.bin[:dtype[:shape]], ex. data.bin:float32:4096x4096
+raw_operand = re.compile(r'^(.+\.(?:bin|raw|dat))(?::(\w+))?(?::(\d+(?:x\d+)*))?$')
+
+# Elements per chunk for reductions over file-backed operands
+chunk_size = 1 << 22
+
+# Compiled speed functions ||r'(t)|| for arc lengths, keyed by curve
+speed_cache = ExpressionCache(maxsize=128)
+
+# Derivatives, keyed by (expression, variable, order)
+diff_cache = ExpressionCache(maxsize=4096)
 
 
 # ------------------ Conversion / Cleaning ------------------
@@ -27,20 +55,7 @@ def clean(expr):
     :returns: cleaned expression for evaluation
     """
 
-    expr = expr.replace(' ', '')
-    expr = expr.replace('sqrt', 'smp.sqrt')
-    expr = expr.replace('e', 'smp.E')
-    expr = expr.replace('π', 'smp.pi')
-    expr = expr.replace('ln', 'smp.ln')
-    expr = expr.replace('log', 'smp.log')
-    expr = expr.replace('sin', 'smp.sin')
-    expr = expr.replace('cos', 'smp.cos')
-    expr = expr.replace('tan', 'smp.tan')
-    expr = expr.replace('csc', 'smp.csc')
-    expr = expr.replace('cot', 'smp.cot')
-    expr = expr.replace('sec', 'smp.sec')
-    expr = expr.replace('^', '**')
-    return expr
+    return to_sympy(expr, implicit=False)
 
 def clean_symbolic(expr):
     """
@@ -51,86 +66,194 @@ def clean_symbolic(expr):
     :returns: cleaned symbolic expression
     """
 
-    # Inital clean
-    expr = clean(expr) 
+    # Single pass: 6t -> 6*t, t^2 -> t**2, names -> sympy names
+    return to_sympy(expr, poss_vars)
+
+def infer_dtype(text):
+    """
+    Picks the narrowest dtype that holds every number in a string
+
+    :param text: numbers as text
+    :returns: numpy dtype (int64, float64 or complex128)
+    """
 
-    if len(expr) < 1:
-        return expr
+    if 'j' in text or 'i' in text.replace('inf', ''):
+        return np.complex128
+    if any(c in text for c in '.eEn'):
+        return np.float64
+    return np.int64
+
+def str_to_ndarray(text):
+    """
+    Parses a vector / matrix string straight into a contiguous array.
+    Accepts '[1, 2, 3]', '(1, 2, 3)', rows split by ';' ('[1, 2; 3, 4]')
+    or nested brackets of any depth ('[[1, 2], [3, 4]]'), with integer,
+    float or complex ('1+2j' / '1+2i') entries
+
+    :param text: vector or matrix expression
+    :returns: int64, float64 or complex128 ndarray
+    """
+
+    text = text.replace(' ', '')
+    depth = len(text) - len(text.lstrip('['))
+    if text.startswith('('):
+        depth = 1
+    rows = text.count(';') + 1
+
+    # Inner dims of nested brackets, from the first group at each level
+    inner = []
+    if depth > 1:
+        counts, closed, level = [1] * depth, [False] * depth, 0
+        for ch in text:
+            if ch == '[':
+                level += 1
+            elif ch == ']':
+                closed[level - 1] = True
+                level -= 1
+                if all(closed[1:]):
+                    break
+            elif ch == ',' and not closed[level - 1]:
+                counts[level - 1] += 1
+        inner = counts[1:]
+
+    # Bulk parse of the flat number list
+    flat = text.translate(strip_brackets).replace(';', ',')
+    dtype = infer_dtype(flat)
+    if dtype == np.complex128:
+        values = flat.replace('i', 'j').split(',')
+        arr = np.fromiter((complex(v) for v in values), dtype=dtype, count=len(values))
     else:
-        # Initialize to first char (loop starts from i=1, checking i-1)
-        cleaned_expr = expr[0]
-
-    for i in range(1, len(expr)):  # edge cases: 6x -> 6*x, x^2 -> x**2
-            if (expr[i-1].isnumeric() and expr[i] in poss_vars) or (expr[i] == '(' or expr[i-1] == ')') \
-                and (expr[i-1] not in operators and expr[i] not in operators):
-                if (expr[i-1] in '()' and expr[i] in '()') or \
-                    ((not expr[i-1].isnumeric() and expr[i-1] not in operators and expr[i-1] not in poss_vars) and expr[i] == '('):
-                    # In case of parens and (ex.) sqrt(x)
-                    cleaned_expr += expr[i]
-                else:
-                    # Sandwich a '*'
-                    cleaned_expr += '*' + expr[i]
-            elif expr[i] == '^':
-                # '^' -> '**'
-                cleaned_expr += '**'
-            else:
-                cleaned_expr += expr[i]
-    return cleaned_expr
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            arr = np.fromstring(flat, dtype=dtype, sep=',')
+        if arr.size != flat.count(',') + 1:
+            raise ValueError(f'could not parse numbers in: {text[:50]}')
+
+    if inner:
+        return arr.reshape([-1] + inner)
+    if rows > 1:
+        return arr.reshape(rows, -1)
+    return arr
 
 def str_to_array(vec):
     """
-    Change string into an array of integers
+    Change string into an array of numbers
 
     :param vec: expression
-    :returns: array of expression
+    :returns: 1-D ndarray of expression
     """
 
-    # Clean before split
-    vec = vec.replace(' ', '')
-    vec = vec.replace('(', '')
-    vec = vec.replace(')', '')
-    vec = vec.replace('[', '')
-    vec = vec.replace(']', '')
-
-    # Create array
-    vec = vec.split(',')
-    arr = []
-    for num in vec:
-        # Turn string nums into ints
-        arr.append(int(num))
-    return arr
+    return str_to_ndarray(vec).ravel()
 
 def str_to_array_dim(matrix):
     """
-    Change string into an array of integers
+    Change string into an array of numbers
     for a dimensional expression (matrixes)
 
     :param matrix: matrix expression
-    :returns: matrix expression as a cleaned & seperated array
+    :returns: matrix expression as an ndarray
     """
 
-    # Clean before split
-    matrix = matrix.replace(' ', '')
-    matrix = matrix.replace('[', '')
-    matrix = matrix.replace(']', '')
+    return str_to_ndarray(matrix)
 
-    # Create array
-    matrix_rows = matrix.split(';')
-    arr = []
-    for row in matrix_rows:
-        # Split row into individual numbers
-        row_nums = row.split(',')
+def is_file_operand(text):
+    """
+    :param text: operand string
+    :returns: whether text is written as a file operand (a .npy or raw binary path)
+    """
+
+    text = text.strip()
+    return text.endswith('.npy') or raw_operand.match(text) is not None
+
+def load_operand(text):
+    """
+    Memory-maps a file-backed operand, if text names one: a .npy file
+    or raw binary (path.bin[:dtype[:shape]], float64 1-D by default)
+
+    :param text: operand string
+    :returns: read-only memmap, or None if text isn't a file operand
+    :raises FileNotFoundError: if the file operand doesn't exist
+    """
 
-        # Convert string nums into ints and append to the row
-        arr.append([int(num) for num in row_nums])  
+    text = text.strip()
+    if not is_file_operand(text):
+        return None
+    if text.endswith('.npy'):
+        if not os.path.exists(text):
+            raise FileNotFoundError(f'no such operand file: {text}')
+        return np.load(text, mmap_mode='r')
+
+    path, dtype, shape = raw_operand.match(text).groups()
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'no such operand file: {path}')
+    arr = np.memmap(path, dtype=np.dtype(dtype or 'float64'), mode='r')
+    if shape:
+        arr = arr.reshape([int(n) for n in shape.split('x')])
     return arr
 
+def to_vector(a):
+    """
+    :param a: vector expression, file operand or ndarray
+    :returns: 1-D ndarray (a view for file operands, nothing is read yet)
+    """
+
+    if not isinstance(a, np.ndarray):
+        loaded = load_operand(a)
+        a = loaded if loaded is not None else str_to_array(a)
+    return a.reshape(-1)
+
+def to_matrix(a):
+    """
+    :param a: matrix expression, file operand or ndarray
+    :returns: ndarray
+    """
+
+    if isinstance(a, np.ndarray):
+        return a
+    loaded = load_operand(a)
+    return loaded if loaded is not None else str_to_array_dim(a)
+
+def chunked_dot(a, b):
+    """
+    Dot product of two 1-D arrays, a chunk at a time so
+    file-backed operands are streamed rather than loaded
+
+    :param a: vector a
+    :param b: vector b
+    :returns: dot product
+    """
+
+    if a.shape != b.shape:
+        raise ValueError(f'shapes {a.shape} and {b.shape} not aligned')
+    if a.size <= chunk_size:
+        return np.dot(a, b)
+    return sum(np.dot(a[i:i + chunk_size], b[i:i + chunk_size])
+               for i in range(0, a.size, chunk_size))
+
+def chunked_norm(a):
+    """
+    Euclidean norm of a 1-D array, a chunk at a time (scaled
+    by the largest entry so sums of squares don't overflow)
+
+    :param a: vector
+    :returns: norm
+    """
+
+    if a.size <= chunk_size:
+        return np.linalg.norm(a)
+    chunks = range(0, a.size, chunk_size)
+    scale = max(np.abs(a[i:i + chunk_size]).max() for i in chunks)
+    if scale == 0:
+        return 0.0
+    total = sum(np.sum(np.abs(a[i:i + chunk_size] / scale) ** 2) for i in chunks)
+    return scale * np.sqrt(total)
+
 def str_to_array_expr(vec):
     """
     Changes string expression into an array of expressions
 
     :param vec: expression
-    :returns: array of expression
+    :returns: array of parsed expressions
     """
 
     temp_str = ''
@@ -145,10 +268,70 @@ def str_to_array_expr(vec):
     temp_arr = temp_str.split(',')
     arr = []
     for expr in temp_arr:
-        arr.append(clean_symbolic(expr))
+        arr.append(parse(clean_symbolic(expr)))
     return arr
 
 
+# ------------------ Symbolic Results ------------------
+
+class SymbolicResult:
+    """
+    Result of a symbolic vector operation: sympy expressions, printed
+    in the same syntax the user types ('[2t, cos(t), 3]', '[a, b; c, d]')
+    """
+
+    def __init__(self, exprs, shape=None):
+        """
+        :param exprs: flat list of sympy expressions
+        :param shape: () for a scalar, (n,) for a vector (default), (rows, cols) for a matrix
+        """
+        self.exprs = list(exprs)
+        self.shape = (len(self.exprs),) if shape is None else tuple(shape)
+        self._text = None
+
+    def __iter__(self):
+        return iter(self.exprs)
+
+    def __len__(self):
+        return len(self.exprs)
+
+    def __getitem__(self, i):
+        return self.exprs[i]
+
+    def __eq__(self, other):
+        if isinstance(other, SymbolicResult):
+            return self.shape == other.shape and self.exprs == other.exprs
+        return NotImplemented
+
+    def tolist(self):
+        """
+        :returns: expressions nested to shape (a single expression for scalars)
+        """
+        if self.shape == ():
+            return self.exprs[0]
+        if len(self.shape) == 2:
+            cols = self.shape[1]
+            return [self.exprs[i:i + cols] for i in range(0, len(self.exprs), cols)]
+        return list(self.exprs)
+
+    def __str__(self):
+        # Printed once, each component through the single pass tokenizer
+        if self._text is None:
+            parts = [post_clean(str(expr)) for expr in self.exprs]
+            if self.shape == ():
+                self._text = parts[0]
+            elif len(self.shape) == 2:
+                cols = self.shape[1]
+                rows = [', '.join(parts[i:i + cols]) for i in range(0, len(parts), cols)]
+                self._text = '[' + '; '.join(rows) + ']'
+            else:
+                self._text = '[' + ', '.join(parts) + ']'
+        return self._text
+
+    def __repr__(self):
+        return f'SymbolicResult({self.tolist()!r})'
+
+
 # ------------------ Operations ------------------
 
 def add(a, b):
@@ -158,8 +341,8 @@ def add(a, b):
     :param b: vector b
     :returns: added vectors
     """
-    a = np.array(str_to_array(a))
-    b = np.array(str_to_array(b))
+    a = to_vector(a)
+    b = to_vector(b)
     return a+b
 
 def sub(a, b):
@@ -169,8 +352,8 @@ def sub(a, b):
     :param b: vector b
     :returns: subtracted vectors
     """
-    a = np.array(str_to_array(a))
-    b = np.array(str_to_array(b))
+    a = to_vector(a)
+    b = to_vector(b)
     return a-b
 
 def dot_product(a, b):
@@ -180,19 +363,31 @@ def dot_product(a, b):
     :param b: vector b
     :returns: dot product of the two vectors
     """
-    a = np.array(str_to_array(a))
-    b = np.array(str_to_array(b))
-    return np.dot(a, b)
+    a = to_vector(a)
+    b = to_vector(b)
+    return chunked_dot(a, b)
 
 def det(a):
     """
-    Determinant
-    :param a: vector
-    :returns: determinant
+    Determinant (from slogdet, so large matrices don't overflow).
+    LU factorization needs the matrix in memory, a file operand is read once
+    :param a: matrix
+    :returns: determinant, as a '<mantissa>e<exponent>' string if past float range
     """
-    a = np.array(str_to_array_dim(a))
-    det = np.linalg.det(a)
-    return det
+    a = to_matrix(a)
+    sign, logdet = np.linalg.slogdet(a)
+    if logdet < 709:
+        # Within float range
+        return sign * np.exp(logdet)
+
+    log10 = logdet / math.log(10)
+    exponent = math.floor(log10)
+    mantissa = 10 ** (log10 - exponent)
+    if round(mantissa, 6) >= 10:
+        # log10 just under a whole number (ex. 399.9999999)
+        exponent += 1
+        mantissa /= 10
+    return f'{sign * mantissa:.6f}e+{exponent}'
 
 def cross_product(a, b):
     """
@@ -201,8 +396,8 @@ def cross_product(a, b):
     :param b: vector b
     :returns: cross product of the two vectors
     """
-    a = np.array(str_to_array(a))
-    b = np.array(str_to_array(b))
+    a = to_vector(a)
+    b = to_vector(b)
     return np.cross(a, b)
 
 def norm_length(a):
@@ -211,8 +406,8 @@ def norm_length(a):
     :param a: vector
     :returns: norm of vector
     """
-    a = np.array(str_to_array(a))
-    return np.linalg.norm(a)
+    a = to_vector(a)
+    return chunked_norm(a)
 
 def projection(a, b):
     """
@@ -221,48 +416,340 @@ def projection(a, b):
     :param b: vector b
     :returns: projection of vector a on vector b
     """
-    a = np.array(str_to_array(a))
-    b = np.array(str_to_array(b))
-    proj = np.dot(a, b) / np.linalg.norm(b) ** 2 * b
+    a = to_vector(a)
+    b = to_vector(b)
+    proj = chunked_dot(a, b) / chunked_norm(b) ** 2 * b
     return proj
 
-def arc_length(a):
+def matmul(a, b):
+    """
+    Matrix multiplication
+    :param a: matrix a
+    :param b: matrix (or vector) b
+    :returns: product a @ b
+    """
+    return to_matrix(a) @ to_matrix(b)
+
+def inverse(a):
+    """
+    Matrix inverse
+    :param a: matrix
+    :returns: inverse of matrix
+    """
+    return np.linalg.inv(to_matrix(a))
+
+def solve(a, b):
+    """
+    Solves the linear system a x = b (LU based, more stable than inv(a) @ b)
+    :param a: square matrix
+    :param b: right hand side vector / matrix
+    :returns: x
+    """
+    return np.linalg.solve(to_matrix(a), to_matrix(b))
+
+def rank(a):
+    """
+    Matrix rank (from singular values)
+    :param a: matrix
+    :returns: rank
+    """
+    return np.linalg.matrix_rank(to_matrix(a))
+
+def eigenvalues(a):
+    """
+    Eigenvalues, using the symmetric / hermitian solver when possible
+    :param a: square matrix
+    :returns: eigenvalues
+    """
+    a = to_matrix(a)
+    if np.allclose(a, a.conj().T):
+        return np.linalg.eigvalsh(a)
+    return np.linalg.eigvals(a)
+
+def lu(a):
+    """
+    LU decomposition with partial pivoting
+    :param a: matrix
+    :returns: (P, L, U) with a = P @ L @ U
+    """
+    return scipy_linalg.lu(to_matrix(a))
+
+def qr(a):
+    """
+    QR decomposition
+    :param a: matrix
+    :returns: (Q, R) with a = Q @ R
+    """
+    return np.linalg.qr(to_matrix(a))
+
+def svd(a):
+    """
+    Singular value decomposition (reduced, so tall / wide matrices stay small)
+    :param a: matrix
+    :returns: (U, S, Vh) with a = U @ diag(S) @ Vh
+    """
+    return np.linalg.svd(to_matrix(a), full_matrices=False)
+
+def speed_function(a):
+    """
+    Compiles the speed ||r'(t)|| of a curve, reusing a cached compiled function
+
+    :param a: curve expression, ex. '[cos(t), sin(t), t]'
+    :returns: vectorized function of t
+    """
+    key = a.replace(' ', '')
+    speed = speed_cache.get(key)
+    if speed is None:
+        r = smp.Matrix(str_to_array_expr(key))
+        compiled = smp.lambdify([t], smp.sqrt(sum(d ** 2 for d in smp.diff(r, t))), 'numpy')
+
+        # Constant speeds come back as scalars, broadcast to t's shape
+        speed = lambda ts: np.zeros(np.shape(ts)) + compiled(ts)
+        speed_cache.put(key, speed)
+    return speed
+
+def parse_bounds(bounds):
+    """
+    :param bounds: 'start, end' expression (ex. '0, 2π') or None for [0, 1]
+    :returns: (start, end) floats
+    """
+    if bounds is None or bounds.strip() == '':
+        return 0.0, 1.0
+    start, end = str_to_array_expr(bounds)
+    return float(start), float(end)
+
+def arc_length(a, bounds=None, method='quad'):
     """
     Arc length of a vector
-    :param a: vector
+    :param a: vector (curve in t)
+    :param bounds: 'start, end' of t (defaults to 0, 1)
+    :param method: 'quad' (adaptive scipy quad) or 'gauss' (fixed-order Gauss-Legendre)
     :returns: arc length of vector
     """
-    a = np.array(str_to_array_expr(a))
-    n_a = []
-    for i in a:
-        n_a.append(int(i))
-    expr = smp.Matrix([n_a[0], n_a[1], n_a[2]])
-    arc = smp.lambdify([t], smp.diff(expr,t).norm())
-
-    # Evaluate integral from [0-1] using scipy quad method
-    arc = quad(arc, 0, 1)[0]
+    start, end = parse_bounds(bounds)
+    if method == 'gauss':
+        arc = arc_lengths([a], [(start, end)])[0, 0]
+    else:
+        arc = scipy_integrate.quad(speed_function(a), start, end)[0]
     arc = str(arc)
     arc = post_clean(arc)
     return arc
 
-def derivative(a):
+def arc_lengths(curves, intervals, order=32):
+    """
+    Arc lengths of many curves over many intervals with fixed-order
+    Gauss-Legendre quadrature, vectorized over the intervals
+
+    :param curves: list of curve expressions
+    :param intervals: list of (start, end) t-intervals
+    :param order: quadrature nodes per interval
+    :returns: (len(curves), len(intervals)) ndarray of arc lengths
+    """
+    nodes, weights = np.polynomial.legendre.leggauss(order)
+    intervals = np.asarray(intervals, dtype=float).reshape(-1, 2)
+    mid = (intervals[:, 0] + intervals[:, 1]) / 2
+    half = (intervals[:, 1] - intervals[:, 0]) / 2
+
+    # Every node of every interval at once: (intervals, order)
+    ts = mid[:, None] + half[:, None] * nodes
+    lengths = np.empty((len(curves), len(intervals)))
+    for row, curve in enumerate(curves):
+        lengths[row] = half * (speed_function(curve)(ts) @ weights)
+    return lengths
+
+def diff(expr, var, order=1):
+    """
+    Differentiation core shared by the symbolic vector operations,
+    caching each (expression, variable, order) derivative
+
+    :param expr: sympy expression
+    :param var: variable symbol
+    :param order: derivative order
+    :returns: derivative
+    """
+    key = (expr, var, order)
+    deriv = diff_cache.get(key)
+    if deriv is None:
+        if order > 1:
+            # Build on the cached lower order derivative
+            deriv = smp.diff(diff(expr, var, order - 1), var)
+        else:
+            deriv = smp.diff(expr, var)
+        diff_cache.put(key, deriv)
+    return deriv
+
+def field(a):
+    """
+    :param a: vector field expression, ex. '[x y, y z, z x]'
+    :returns: list of parsed components
+    """
+    return list(str_to_array_expr(a))
+
+def derivative(a, order=None):
     """
     Derivative of a vector
     :param a: vector
+    :param order: derivative order (defaults to 1)
     :returns: derivative of the vector
     """
-    a = np.array(str_to_array_expr(a))
-    expr = smp.Matrix([a[0], a[1], a[2]])
-    deriv = smp.diff(expr, t)
-    deriv = str(deriv)
+    order = int(order) if order not in (None, '') else 1
+    return SymbolicResult([diff(c, t, order) for c in field(a)])
+
+def gradient(a):
+    """
+    Gradient of a scalar field in x, y, z
+    :param a: scalar expression
+    :returns: [∂f/∂x, ∂f/∂y, ∂f/∂z]
+    """
+    f = parse(clean_symbolic(a.replace(' ', '')))
+    return SymbolicResult([diff(f, var) for var in (x, y, z)])
 
-    # Clean derivative output
-    deriv = deriv.replace('Matrix(', '')
-    deriv = deriv.replace('[', '')
-    deriv = deriv.replace('])', '')
-    deriv = deriv.replace(']', '')
-    cleaned_deriv = post_clean(deriv)
-    return '[' + cleaned_deriv + ']'
+def divergence(a):
+    """
+    Divergence of a vector field in x, y, z
+    :param a: vector field [P, Q, R]
+    :returns: ∂P/∂x + ∂Q/∂y + ∂R/∂z
+    """
+    P, Q, R = field(a)
+    return SymbolicResult([smp.simplify(diff(P, x) + diff(Q, y) + diff(R, z))], shape=())
+
+def curl(a):
+    """
+    Curl of a vector field in x, y, z
+    :param a: vector field [P, Q, R]
+    :returns: curl of the field
+    """
+    P, Q, R = field(a)
+    return SymbolicResult([diff(R, y) - diff(Q, z),
+                           diff(P, z) - diff(R, x),
+                           diff(Q, x) - diff(P, y)])
+
+def jacobian(a):
+    """
+    Jacobian matrix of a vector field in x, y, z
+    :param a: vector field
+    :returns: matrix of ∂f_i/∂x_j
+    """
+    components = field(a)
+    return SymbolicResult([diff(c, var) for c in components for var in (x, y, z)],
+                          shape=(len(components), 3))
+
+
+# ------------------ Batched Operations ------------------
+
+def to_batch(a):
+    """
+    :param a: (N, k) ndarray, matrix expression (one vector per row) or file operand
+    :returns: 2-D ndarray of row vectors
+    """
+    a = to_matrix(a)
+    return a.reshape(1, -1) if a.ndim == 1 else a
+
+def batch_add(a, b):
+    """
+    Row-wise vector addition
+    :param a: (N, k) vectors a
+    :param b: (N, k) vectors b
+    :returns: (N, k) sums
+    """
+    return to_batch(a) + to_batch(b)
+
+def batch_sub(a, b):
+    """
+    Row-wise vector subtraction
+    :param a: (N, k) vectors a
+    :param b: (N, k) vectors b
+    :returns: (N, k) differences
+    """
+    return to_batch(a) - to_batch(b)
+
+def batch_dot(a, b):
+    """
+    Row-wise dot products
+    :param a: (N, k) vectors a
+    :param b: (N, k) vectors b
+    :returns: (N,) dot products
+    """
+    return np.einsum('ij,ij->i', to_batch(a), to_batch(b))
+
+def batch_cross(a, b):
+    """
+    Row-wise cross products
+    :param a: (N, 3) vectors a
+    :param b: (N, 3) vectors b
+    :returns: (N, 3) cross products
+    """
+    return np.cross(to_batch(a), to_batch(b))
+
+def batch_norm(a):
+    """
+    Row-wise norms
+    :param a: (N, k) vectors
+    :returns: (N,) norms
+    """
+    return np.linalg.norm(to_batch(a), axis=1)
+
+def batch_projection(a, b):
+    """
+    Row-wise projections of vectors a onto vectors b
+    :param a: (N, k) vectors a
+    :param b: (N, k) vectors b
+    :returns: (N, k) projections
+    """
+    a = to_batch(a)
+    b = to_batch(b)
+    scale = np.einsum('ij,ij->i', a, b) / np.einsum('ij,ij->i', b, b)
+    return scale[:, None] * b
+
+# Operation name -> batched handler (names match vector_calc operations)
+batch_operations = Registry()
+batch_operations.register('add', batch_add, arity=2)
+batch_operations.register('sub', batch_sub, arity=2)
+batch_operations.register('dot', batch_dot, arity=2)
+batch_operations.register('cross', batch_cross, arity=2)
+batch_operations.register('projection', batch_projection, arity=2)
+batch_operations.register('norm', batch_norm)
+
+def batch_vector_calc(oper, a, b=None):
+    """
+    Calculates a vector operation over N pairs of vectors at once
+
+    :param oper: operation ('add', 'sub', 'dot', 'cross', 'projection', 'norm')
+    :param a: (N, k) vectors a
+    :param b: (N, k) vectors b
+    :returns: (N, ...) results, one per row
+    """
+
+    if oper not in batch_operations:
+        raise ValueError(f'no batched version of: {oper}')
+    return batch_operations.call(oper, a, b)
+
+
+# ------------------ Operations Registry ------------------
+
+# Operation name -> handler, labels are the vector page menu entries (in order)
+operations = Registry()
+operations.register('add', add, arity=2, label='vector addition')
+operations.register('sub', sub, arity=2, label='vector subtraction')
+operations.register('dot', dot_product, arity=2, label='dot product')
+operations.register('cross', cross_product, arity=2, label='cross product')
+operations.register('projection', projection, arity=2, label='projection')
+operations.register('det', det, cost='heavy', label='determinant')
+operations.register('norm', norm_length, label='norm of vector')
+operations.register('length', arc_length, optional=1, cost='symbolic', label='arc length')
+operations.register('deriv', derivative, optional=1, cost='symbolic', label='derivative')
+operations.register('matmul', matmul, arity=2, cost='heavy', label='matrix multiply')
+operations.register('solve', solve, arity=2, cost='heavy', label='solve Ax = b')
+operations.register('inv', inverse, cost='heavy', label='inverse')
+operations.register('rank', rank, cost='heavy', label='rank')
+operations.register('eig', eigenvalues, cost='heavy', label='eigenvalues')
+operations.register('lu', lu, cost='heavy', label='LU')
+operations.register('qr', qr, cost='heavy', label='QR')
+operations.register('svd', svd, cost='heavy', label='SVD')
+operations.register('grad', gradient, cost='symbolic', label='gradient')
+operations.register('div', divergence, cost='symbolic', label='divergence')
+operations.register('curl', curl, cost='symbolic', label='curl')
+operations.register('jacobian', jacobian, cost='symbolic', label='jacobian')
 
 
 # ------------------ Main Calculation ------------------
@@ -273,28 +760,37 @@ def vector_calc(oper, a, b=None):
 
     :param oper: operation
     :param a: vector a or matrix expression
-    :param b: vector b
+    :param b: vector b (t bounds 'start, end' for arc length, order for deriv)
     :returns: calculation based on operation
     """
 
-    if oper == 'add':
-        return add(a, b)
-    if oper == 'sub':
-        return sub(a, b)
-    if oper == 'dot':
-        return dot_product(a, b)
-    if oper == 'det':
-        return det(a)
-    if oper == 'cross':
-        return cross_product(a, b)
-    if oper == 'projection':
-        return projection(a, b)
-    if oper == 'norm':
-        return norm_length(a)
-    if oper == 'length':
-        return arc_length(a)
-    if oper == 'deriv':
-        return derivative(a)
+    trace = metrics.start('vector_calc')  # Does nothing unless CALC_METRICS is set
+    trace.operation = oper if oper in operations else 'unknown'
+    result = None
+    try:
+        with trace.stage('operation'):
+            # Unary operations ignore b, unknown operations raise ValueError
+            result = operations.call(oper, a, b)
+        return result
+    except Exception:
+        trace.outcome = 'error'
+        raise
+    finally:
+        trace.finish(metrics.size_of(a) + metrics.size_of(b), metrics.size_of(result))
+
+def vector_calc_timed(oper, a, b=None):
+    """
+    Calculates vector / matrix operations, timing the calculation
+
+    :param oper: operation
+    :param a: vector a or matrix expression
+    :param b: vector b
+    :returns: (calculation, seconds taken)
+    """
+
+    start = time.perf_counter()
+    result = vector_calc(oper, a, b)
+    return result, time.perf_counter() - start
 
 
 # Test: